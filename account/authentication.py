@@ -0,0 +1,95 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+from account.roles import get_user_flags, get_user_stub
+
+
+def get_token_cache_key(key):
+    """Return the cache key of the token with the given `key`."""
+    return f"account:token:{key}"
+
+
+class TokenKeyParser(TokenAuthentication):
+    """Return the token key of the request `Authorization` header.
+
+    Parses the header by the `TokenAuthentication.authenticate` (with its
+    header errors) without the credentials lookup.
+    """
+
+    def authenticate_credentials(self, key):
+        return key
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Token authentication with the cached token -> user lookup.
+
+    Stores the user flags (see `account.roles.UserFlags`, no password hash)
+    of the authenticated token in the default cache for
+    `TOKEN_CACHE_TIMEOUT` seconds, so the subsequent requests are
+    authenticated without queries. The request user of the cached token is
+    the read-only `account.roles.get_user_stub` instance, the views needing
+    the other user fields load the user. Cached tokens are invalidated by
+    the `account.signals` receivers on the token delete and on the user
+    update.
+
+    Provides `aauthenticate` method for the async views.
+    """
+
+    def get_key(self, request):
+        """Return the token key from the request `Authorization` header or
+        `None` if the header does not contain the token keyword."""
+        parser = TokenKeyParser()
+        parser.keyword = self.keyword
+        return parser.authenticate(request)
+
+    def get_auth(self, key, flags):
+        """Return the `(user, token)` pair of the given cached token key."""
+        if not flags.is_active:
+            raise exceptions.AuthenticationFailed(_("User inactive or deleted."))
+
+        user = get_user_stub(flags)
+        return user, self.get_model()(key=key, user=user)
+
+    def authenticate_credentials(self, key):
+        cache_key = get_token_cache_key(key)
+        flags = cache.get(cache_key)
+
+        if flags is not None:
+            return self.get_auth(key, flags)
+
+        user, token = super().authenticate_credentials(key)
+        cache.set(
+            cache_key, get_user_flags(user), settings.TOKEN_CACHE_TIMEOUT,
+        )
+        return user, token
+
+    async def aauthenticate(self, request):
+        """Async version of the `authenticate` method."""
+        key = self.get_key(request)
+
+        if key is None:
+            return None
+
+        cache_key = get_token_cache_key(key)
+        flags = await cache.aget(cache_key)
+
+        if flags is not None:
+            return self.get_auth(key, flags)
+
+        model = self.get_model()
+
+        try:
+            token = await model.objects.select_related("user").aget(key=key)
+        except model.DoesNotExist:
+            raise exceptions.AuthenticationFailed(_("Invalid token."))
+
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(_("User inactive or deleted."))
+
+        await cache.aset(
+            cache_key, get_user_flags(token.user), settings.TOKEN_CACHE_TIMEOUT,
+        )
+        return token.user, token
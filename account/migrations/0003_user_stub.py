@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:40
+
+import django.contrib.auth.models
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0002_remove_user_first_name_remove_user_last_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStub',
+            fields=[
+            ],
+            options={
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('account.user',),
+            managers=[
+                ('objects', django.contrib.auth.models.UserManager()),
+            ],
+        ),
+    ]
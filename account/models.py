@@ -8,7 +8,9 @@ class User(AbstractUser):
 
     The model is inherited from `django.contrib.auth.models.AbstractUser` model
     without `first_name` and `last_name` fields. Provides additional `role` char
-    field with a choice from `RoleChoice` (`RoleChoice.FUFELNITSA` by default).
+    field with a choice from `RoleChoice` (`RoleChoice.FUFELNITSA` by default)
+    and `date_updated` field used by the sepulki list validators, since the
+    list renders the creator usernames.
 
     """
 
@@ -23,3 +25,27 @@ class User(AbstractUser):
     role = models.PositiveSmallIntegerField(
         _("role"), choices=RoleChoice.choices, default=RoleChoice.FUFELNITSA,
     )
+    date_updated = models.DateTimeField(_("date updated"), auto_now=True)
+
+
+class UserStub(User):
+    """Read-only user built from the cached user fields (see
+    `account.roles.get_user_stub`).
+
+    Contains only some of the user fields, saving it would overwrite the
+    other ones (e.g. the password) with the defaults, so its `save` and
+    `delete` methods raise `TypeError`.
+    """
+
+    class Meta:
+        proxy = True
+
+    def save(self, *args, **kwargs):
+        raise TypeError(
+            "The user stub can not be saved, load the user from the database.",
+        )
+
+    def delete(self, *args, **kwargs):
+        raise TypeError(
+            "The user stub can not be deleted, load the user from the database.",
+        )
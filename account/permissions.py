@@ -1,13 +1,15 @@
 from rest_framework.permissions import BasePermission
 
 from account.models import User
+from account.roles import get_user_flags
 
 
 class AbstractUserRolePermission(BasePermission):
     """Allow access by the give `allowed_role` field.
 
     If the given user is authenticated calls checks from the
-    `check_user_instance` method.
+    `check_user_instance` method with the user flags (see
+    `account.roles.get_user_flags`).
 
     """
 
@@ -21,7 +23,7 @@ class AbstractUserRolePermission(BasePermission):
     def has_permission(self, request, view):
         return (
             request.user and request.user.is_authenticated
-            and self.check_user_instance(request.user)
+            and self.check_user_instance(get_user_flags(request.user))
         )
 
 
@@ -0,0 +1,73 @@
+from collections import namedtuple
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+UserFlags = namedtuple(
+    "UserFlags", ("pk", "username", "role", "is_staff", "is_active"),
+)
+"""User fields used by the role permissions and validators."""
+
+
+def get_user_flags_cache_key(pk):
+    """Return the cache key of the flags of the user with the given `pk`."""
+    return f"account:user-flags:{pk}"
+
+
+def get_user_flags(user):
+    """Return the role and staff flags of the given user.
+
+    Args:
+        user: User instance or the user primary key. The flags of the
+            instance are read from its fields, the flags by the primary key
+            are cached in the default cache for `USER_FLAGS_CACHE_TIMEOUT`
+            seconds and invalidated by the `account.signals` receivers.
+
+    Returns:
+        `UserFlags` of the user or `None` if the user does not exist.
+    """
+    if isinstance(user, get_user_model()):
+        return UserFlags(
+            user.pk, user.username, user.role, user.is_staff, user.is_active,
+        )
+
+    cache_key = get_user_flags_cache_key(user)
+    flags = cache.get(cache_key)
+
+    if flags is None:
+        values = (
+            get_user_model().objects.filter(pk=user)
+            .values_list(*UserFlags._fields).first()
+        )
+
+        if values is None:
+            return None
+
+        flags = UserFlags(*values)
+        cache.set(cache_key, flags, settings.USER_FLAGS_CACHE_TIMEOUT)
+
+    return flags
+
+
+def invalidate_user_flags(*pks):
+    """Remove the cached flags of the users with the given `pks`."""
+    cache.delete_many([get_user_flags_cache_key(pk) for pk in pks])
+
+
+def get_user_stub(flags):
+    """Return the read-only user instance built from the given `flags` (no
+    query).
+
+    The `UserStub` instance contains only the flags fields and can be
+    assigned to the foreign keys or used by the role validators, its `save`
+    and `delete` methods raise `TypeError`.
+    """
+    from account.models import UserStub
+
+    user = UserStub(**flags._asdict())
+    user._state.adding = False
+    user._state.db = DEFAULT_DB_ALIAS
+
+    return user
@@ -1,13 +1,48 @@
 from django.contrib.auth import get_user_model
 from rest_framework import serializers
 
+from account.roles import get_user_flags, get_user_stub
+
+
+class CachedUserRelatedField(serializers.PrimaryKeyRelatedField):
+    """Primary key related field resolving users by the cached flags.
+
+    Returns the user stub built by the `account.roles.get_user_stub`, so the
+    field (and the user role validators) do not query the database on the
+    flags cache hit. Fields of the other models are resolved as usual.
+    """
+
+    def to_internal_value(self, data):
+        if self.get_queryset().model is not get_user_model():
+            return super().to_internal_value(data)
+
+        if isinstance(data, bool):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+
+        try:
+            pk = int(data)
+        except (TypeError, ValueError):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+
+        flags = get_user_flags(pk)
+
+        if flags is None:
+            self.fail("does_not_exist", pk_value=data)
+
+        return get_user_stub(flags)
+
 
 class LoginSerializer(serializers.ModelSerializer):
-    """User model serializer with `username` and `password` fields only."""
+    """User model serializer with `username` and `password` fields only.
+
+    Removes `username` field unique validator, so the existing user
+    credentials are valid.
+    """
 
     class Meta:
         model = get_user_model()
         fields = ("username", "password")
+        extra_kwargs = {"username": {"validators": []}}
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -0,0 +1,34 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from account.authentication import get_token_cache_key
+from account.roles import invalidate_user_flags
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    """Remove the deleted token (e.g. on logout) from the cache."""
+    cache.delete(get_token_cache_key(instance.key))
+
+
+@receiver(post_save, sender=get_user_model())
+def invalidate_user_tokens(sender, instance, created, **kwargs):
+    """Remove the updated user tokens from the cache."""
+    if created:
+        return
+
+    cache.delete_many([
+        get_token_cache_key(key)
+        for key in Token.objects.filter(user=instance)
+        .values_list("key", flat=True)
+    ])
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def invalidate_cached_user_flags(sender, instance, **kwargs):
+    """Remove the updated or deleted user flags from the cache."""
+    invalidate_user_flags(instance.pk)
@@ -1,3 +1,154 @@
-from django.test import TestCase
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.test import RequestFactory, TestCase
+from rest_framework import exceptions
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from account.authentication import (CachedTokenAuthentication,
+                                    get_token_cache_key)
+from account.models import User
+from account.roles import get_user_flags, get_user_stub
+from sepulka.validators import validate_user_grymzik, validate_user_shmurdik
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            "shmurdik", password="password", role=User.RoleChoice.SHMURDIK,
+        )
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.authentication = CachedTokenAuthentication()
+        self.request = RequestFactory().get(
+            "/", HTTP_AUTHORIZATION=f"Token {self.token.key}",
+        )
+
+    def authenticate(self):
+        return self.authentication.authenticate(self.request)
+
+    def test_authenticate(self):
+        for _ in range(2):
+            user, token = self.authenticate()
+
+            self.assertEqual(user, self.user)
+            self.assertEqual(token.key, self.token.key)
+
+    def test_cached_value(self):
+        self.authenticate()
+
+        # The user flags (without the password hash) are cached.
+        self.assertEqual(
+            cache.get(get_token_cache_key(self.token.key)),
+            get_user_flags(self.user),
+        )
+
+    def test_async(self):
+        for _ in range(2):
+            user, token = async_to_sync(self.authentication.aauthenticate)(
+                self.request,
+            )
+
+            self.assertEqual(user, self.user)
+            self.assertEqual(token.key, self.token.key)
+
+    def test_invalidation(self):
+        self.authenticate()
+
+        self.user.is_active = False
+        self.user.save()
+
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.authenticate()
+
+        self.user.is_active = True
+        self.user.save()
+        self.authenticate()
+        self.token.delete()
+
+        with self.assertRaises(exceptions.AuthenticationFailed):
+            self.authenticate()
+
+    def test_queries(self):
+        with self.assertNumQueries(1):
+            self.authenticate()
+
+        # The cached token is authenticated without queries.
+        for authenticate in [
+            self.authenticate,
+            lambda: async_to_sync(self.authentication.aauthenticate)(
+                self.request,
+            ),
+        ]:
+            with self.assertNumQueries(0):
+                user, token = authenticate()
+
+            self.assertEqual(user, self.user)
+            self.assertEqual(user.role, self.user.role)
+
+    def test_header_errors(self):
+        for header in ["Token", "Token a b"]:
+            request = RequestFactory().get("/", HTTP_AUTHORIZATION=header)
+
+            with self.subTest(header=header), self.assertRaises(
+                exceptions.AuthenticationFailed,
+            ):
+                self.authentication.authenticate(request)
+
+        request = RequestFactory().get("/", HTTP_AUTHORIZATION="Basic a")
+        self.assertIsNone(self.authentication.authenticate(request))
+
+    def test_personal_endpoint(self):
+        self.authenticate()
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+
+        # The personal endpoints load the full user of the cached token.
+        response = client.patch(
+            "/users/me/", {"email": "shmurdik@example.com"}, format="json",
+        )
+
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(
+            client.get("/users/me/").data["email"], "shmurdik@example.com",
+        )
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password("password"))
+
+
+class UserRolesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            "shmurdik", password="password", email="shmurdik@example.com",
+            role=User.RoleChoice.SHMURDIK,
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_user_stub(self):
+        stub = get_user_stub(get_user_flags(self.user.pk))
+
+        self.assertEqual(stub, self.user)
+
+        for method in [stub.save, stub.delete]:
+            with self.assertRaises(TypeError):
+                method()
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.email, "shmurdik@example.com")
+        self.assertTrue(self.user.check_password("password"))
+
+    def test_role_validators(self):
+        validate_user_shmurdik(self.user.pk)
+
+        with self.assertRaises(ValidationError):
+            validate_user_grymzik(self.user.pk)
+
+        with self.assertRaises(ValidationError):
+            validate_user_shmurdik(self.user.pk + 1)
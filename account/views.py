@@ -9,9 +9,11 @@ from rest_framework.viewsets import GenericViewSet
 
 from account.permissions import IsShmurdikOrStaffPermission
 from account.serializers import LoginSerializer, UserSerializer
+from config.metrics import SerializerTimingMixin
 
 
 class UserViewSet(
+    SerializerTimingMixin,
     mixins.ListModelMixin,
     mixins.RetrieveModelMixin,
     mixins.UpdateModelMixin,
@@ -99,6 +101,7 @@ class UserViewSet(
 
 
 class UserPersonalViewSet(
+    SerializerTimingMixin,
     mixins.RetrieveModelMixin,
     mixins.UpdateModelMixin,
     mixins.DestroyModelMixin,
@@ -107,11 +110,13 @@ class UserPersonalViewSet(
     """User personal retrieve, update and destroy functionality.
     
     Overrides the `get_object` method, so user can manage the personal instance
-    only.
+    only (loaded by the request user primary key).
     """
 
     queryset = get_user_model().objects.all()
     serializer_class = UserSerializer
     
     def get_object(self):
-        return self.request.user
+        # The token authenticated request user is the read-only stub of the
+        # cached user flags (see `account.authentication`).
+        return self.get_queryset().get(pk=self.request.user.pk)
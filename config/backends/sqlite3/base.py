@@ -0,0 +1,43 @@
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """SQLite backend tuned for the single node deployments.
+
+    Enables the write-ahead log, so readers do not block the writer, relaxes
+    `synchronous` mode (safe with WAL) and waits for the locked database
+    instead of failing immediately.
+
+    The write lock of the deferred transaction is taken by its first write,
+    which fails instead of waiting if another writer has committed since the
+    transaction read the database, so the read-then-write transactions (e.g.
+    the compare-and-set updates) would fail under the concurrent writes.
+    Such transactions set `begin_immediate` (see
+    `sepulka.models.atomic_for_update`) to take the write lock when they
+    begin (`BEGIN IMMEDIATE`), other ones begin as the `transaction_mode`
+    option sets.
+    """
+
+    pragmas = {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": 5000,
+    }
+    """SQLite pragmas executed on each new connection."""
+
+    begin_immediate = False
+    """Whether the next transaction begins by `BEGIN IMMEDIATE`."""
+
+    def get_new_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+
+        for name, value in self.pragmas.items():
+            connection.execute(f"PRAGMA {name} = {value}")
+
+        return connection
+
+    def _start_transaction_under_autocommit(self):
+        if self.begin_immediate:
+            self.cursor().execute("BEGIN IMMEDIATE")
+        else:
+            super()._start_transaction_under_autocommit()
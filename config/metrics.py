@@ -0,0 +1,321 @@
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+from rest_framework import serializers
+from rest_framework.permissions import IsAdminUser
+from rest_framework.views import APIView
+
+_current = ContextVar("request_metrics", default=None)
+
+
+class RequestMetrics:
+    """Query count, DB time and serializer time of the current request."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.in_serializer = False
+        self.label = "unresolved"
+
+
+class Histogram:
+    """Thread safe cumulative histogram with the labels.
+
+    Args:
+        name: Metric name.
+        help_text: Metric description.
+        buckets: Sorted bucket upper bounds.
+    """
+
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, label, value):
+        with self.lock:
+            counts, total, count = self.series.get(
+                label, ([0] * len(self.buckets), 0.0, 0),
+            )
+
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+
+            self.series[label] = (counts, total + value, count + 1)
+
+    def render(self):
+        """Return the histogram in the Prometheus text format."""
+        lines = [
+            f"# HELP {self.name} {self.help_text}",
+            f"# TYPE {self.name} histogram",
+        ]
+
+        with self.lock:
+            series = {
+                label: (list(counts), total, count)
+                for label, (counts, total, count) in self.series.items()
+            }
+
+        for label, (counts, total, count) in sorted(series.items()):
+            view, _, action = label.partition(".")
+            labels = f'view="{view}",action="{action}"'
+
+            for bound, bucket_count in zip(self.buckets, counts):
+                lines.append(
+                    f'{self.name}_bucket{{{labels},le="{bound}"}} {bucket_count}'
+                )
+
+            lines.append(f'{self.name}_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f"{self.name}_sum{{{labels}}} {total}")
+            lines.append(f"{self.name}_count{{{labels}}} {count}")
+
+        return "\n".join(lines)
+
+
+SECONDS_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+)
+QUERIES_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+request_duration = Histogram(
+    "request_duration_seconds", "Total request latency.", SECONDS_BUCKETS,
+)
+request_db_duration = Histogram(
+    "request_db_duration_seconds", "Time spent in the SQL queries.",
+    SECONDS_BUCKETS,
+)
+request_serializer_duration = Histogram(
+    "request_serializer_duration_seconds",
+    "Time spent in the serializers validation and representation.",
+    SECONDS_BUCKETS,
+)
+request_db_queries = Histogram(
+    "request_db_queries", "Number of the SQL queries.", QUERIES_BUCKETS,
+)
+histograms = (
+    request_duration, request_db_duration,
+    request_serializer_duration, request_db_queries,
+)
+
+
+def render_metrics():
+    """Return all the request histograms in the Prometheus text format."""
+    return "\n".join(histogram.render() for histogram in histograms) + "\n"
+
+
+def db_execute_wrapper(execute, sql, params, many, context):
+    """Count the query and its time to the current request metrics."""
+    metrics = _current.get()
+
+    if metrics is None:
+        return execute(sql, params, many, context)
+
+    start = time.perf_counter()
+
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.db_time += time.perf_counter() - start
+        metrics.queries += 1
+
+
+def install_db_execute_wrapper(sender, connection, **kwargs):
+    """Add the `db_execute_wrapper` to the created connection once."""
+    if db_execute_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(db_execute_wrapper)
+
+
+@contextmanager
+def serializer_timing():
+    """Count the time of the block to the current request serializer time.
+
+    Nested blocks (e.g. the `data` of the timed serializer subclass calling
+    the base class property) are counted by the outermost block only.
+    """
+    metrics = _current.get()
+
+    if metrics is None or metrics.in_serializer:
+        yield
+        return
+
+    metrics.in_serializer = True
+    start = time.perf_counter()
+
+    try:
+        yield
+    finally:
+        metrics.serializer_time += time.perf_counter() - start
+        metrics.in_serializer = False
+
+
+class TimedSerializerMixin:
+    """Count the serializer validation and representation time."""
+
+    def is_valid(self, *args, **kwargs):
+        with serializer_timing():
+            return super().is_valid(*args, **kwargs)
+
+    @property
+    def data(self):
+        with serializer_timing():
+            return super().data
+
+
+@functools.cache
+def get_timed_serializer_class(serializer_class):
+    """Return the `TimedSerializerMixin` subclass of the serializer class.
+
+    The list serializer created by the `many=True` argument is timed too,
+    the subclass `Meta` sets its timed `list_serializer_class`.
+    """
+    attrs = {"__module__": serializer_class.__module__}
+
+    if not issubclass(serializer_class, serializers.ListSerializer):
+        meta = getattr(serializer_class, "Meta", object)
+        attrs["Meta"] = type("Meta", (meta,), {
+            "list_serializer_class": get_timed_serializer_class(getattr(
+                meta, "list_serializer_class", serializers.ListSerializer,
+            )),
+        })
+
+    return type(
+        serializer_class.__name__,
+        (TimedSerializerMixin, serializer_class), attrs,
+    )
+
+
+class SerializerTimingMixin:
+    """Time the serializers created by the `get_serializer` view method.
+
+    The serializers created by the view directly are timed by the
+    `serializer_timing` blocks.
+    """
+
+    def get_serializer(self, *args, **kwargs):
+        serializer_class = get_timed_serializer_class(
+            self.get_serializer_class(),
+        )
+        kwargs.setdefault("context", self.get_serializer_context())
+        return serializer_class(*args, **kwargs)
+
+
+def get_view_label(view_func):
+    """Return the `<view>.<action>` label of the resolved view function."""
+    view_class = (
+        getattr(view_func, "cls", None)
+        or getattr(view_func, "view_class", None)
+    )
+
+    if view_class is None:
+        return f"{view_func.__module__}.{view_func.__name__}".replace(".", "_")
+
+    return view_class.__name__
+
+
+class RequestMetricsMiddleware:
+    """Record the query count, DB time, serializer time and total latency.
+
+    Enabled by the `REQUEST_METRICS` setting. Observes the request
+    histograms per `<view>.<action>` and adds the `Server-Timing` header
+    to the response.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_METRICS:
+            raise MiddlewareNotUsed()
+
+        self.get_response = get_response
+
+        connection_created.connect(install_db_execute_wrapper)
+
+        for connection in connections.all():
+            install_db_execute_wrapper(None, connection)
+
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        metrics = _current.get()
+
+        if metrics is None:
+            return None
+
+        actions = getattr(view_func, "actions", None) or {}
+        action = actions.get(request.method.lower(), request.method.lower())
+        metrics.label = f"{get_view_label(view_func)}.{action}"
+
+        return None
+
+    def finalize(self, response, metrics, start):
+        total = time.perf_counter() - start
+
+        request_duration.observe(metrics.label, total)
+        request_db_duration.observe(metrics.label, metrics.db_time)
+        request_serializer_duration.observe(
+            metrics.label, metrics.serializer_time,
+        )
+        request_db_queries.observe(metrics.label, metrics.queries)
+
+        response.headers["Server-Timing"] = ", ".join((
+            f'db;dur={metrics.db_time * 1000:.2f};desc="{metrics.queries} queries"',
+            f"serializer;dur={metrics.serializer_time * 1000:.2f}",
+            f"total;dur={total * 1000:.2f}",
+        ))
+
+        return response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        start = time.perf_counter()
+
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+
+        return self.finalize(response, metrics, start)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        start = time.perf_counter()
+
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+
+        return self.finalize(response, metrics, start)
+
+
+class MetricsView(APIView):
+    """Return the request histograms of the process in the Prometheus text
+    format (admin users only)."""
+
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request, *args, **kwargs):
+        return HttpResponse(
+            render_metrics(),
+            content_type="text/plain; version=0.0.4; charset=utf-8",
+        )
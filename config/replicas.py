@@ -0,0 +1,136 @@
+import hashlib
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import (iscoroutinefunction, markcoroutinefunction,
+                          sync_to_async)
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+_use_replica = ContextVar("use_replica", default=False)
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+class ReplicaRouter:
+    """Route reads of the safe requests to the `DATABASE_REPLICAS` aliases.
+
+    Reads are routed to the random replica only inside the request marked
+    by the `ReplicaMiddleware` and outside the transaction of the primary
+    database, all other reads and all writes use the primary database.
+    """
+
+    def db_for_read(self, model, **hints):
+        if not _use_replica.get() or not settings.DATABASE_REPLICAS:
+            return None
+
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+
+        return None
+
+
+@contextmanager
+def use_primary():
+    """Route the reads inside the block to the primary database.
+
+    Used by the reads filling the shared caches, so the lagging replica
+    data is not cached as the current one.
+    """
+    token = _use_replica.set(False)
+
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+def get_sticky_cache_key(request):
+    """Return the cache key identifying the request client.
+
+    The client is identified by the `Authorization` header, the session
+    cookie or the remote address.
+    """
+    client = (
+        request.headers.get("Authorization")
+        or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+        or request.META.get("REMOTE_ADDR", "")
+    )
+    digest = hashlib.sha1(client.encode(), usedforsecurity=False).hexdigest()
+    return f"replicas:sticky:{digest}"
+
+
+class ReplicaMiddleware:
+    """Allow the safe requests to read from the replica databases.
+
+    Unsafe requests (writes) make the client sticky to the primary database
+    for the `REPLICA_STICKY_SECONDS`, so the client reads its own writes
+    even if the replicas lag behind.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def is_replica_allowed(self, request):
+        return (
+            request.method in SAFE_METHODS
+            and not cache.get(get_sticky_cache_key(request))
+        )
+
+    def stick_to_primary(self, request):
+        cache.set(
+            get_sticky_cache_key(request), True,
+            settings.REPLICA_STICKY_SECONDS,
+        )
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+
+        token = _use_replica.set(self.is_replica_allowed(request))
+
+        try:
+            return self.get_response(request)
+        finally:
+            _use_replica.reset(token)
+
+            if request.method not in SAFE_METHODS:
+                self.stick_to_primary(request)
+
+    async def __acall__(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return await self.get_response(request)
+
+        token = _use_replica.set(
+            await sync_to_async(self.is_replica_allowed)(request),
+        )
+
+        try:
+            return await self.get_response(request)
+        finally:
+            _use_replica.reset(token)
+
+            if request.method not in SAFE_METHODS:
+                await sync_to_async(self.stick_to_primary)(request)
@@ -13,6 +13,8 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 import os
 from pathlib import Path
 
+from config.database import ENGINES, parse_database_url
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -50,12 +52,15 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    "config.metrics.RequestMetricsMiddleware",
+    "config.replicas.ReplicaMiddleware",
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    "sepulka.flow.FlowBufferMiddleware",
 ]
 
 ROOT_URLCONF = 'config.urls'
@@ -83,12 +88,97 @@ WSGI_APPLICATION = 'config.wsgi.application'
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+    "default": {
+        **parse_database_url(
+            os.getenv("DATABASE_URL")
+            or f"sqlite:///{BASE_DIR / 'db.sqlite3'}",
+        ),
+        # Reuse connections between requests, check them before the reuse.
+        "CONN_MAX_AGE": int(os.getenv("CONN_MAX_AGE", 60)),
+        "CONN_HEALTH_CHECKS": True,
+    },
+}
+
+if DATABASES["default"]["ENGINE"] == ENGINES["sqlite"]:
+    # Test against the database file: the default in-memory test database
+    # fails on the locks of the concurrent connections instead of waiting.
+    DATABASES["default"]["TEST"] = {"NAME": BASE_DIR / "test_db.sqlite3"}
+
+if (
+    os.getenv("DATABASE_POOL") == "True"
+    and DATABASES["default"]["ENGINE"] == ENGINES["postgres"]
+):
+    # PostgreSQL connection pool (requires Django 5.1+ and `psycopg[pool]`),
+    # can not be used with the persistent connections.
+    DATABASES["default"]["OPTIONS"]["pool"] = True
+    DATABASES["default"]["CONN_MAX_AGE"] = 0
+
+# Read replicas of the default database (comma separated database URLs), used
+# by the `config.replicas.ReplicaRouter` for the safe requests reads.
+DATABASE_REPLICAS = []
+
+for index, url in enumerate(filter(None, os.getenv(
+    "DATABASE_REPLICA_URLS", "",
+).split(","))):
+    alias = f"replica_{index}"
+
+    DATABASES[alias] = {
+        **parse_database_url(url),
+        "CONN_MAX_AGE": DATABASES["default"]["CONN_MAX_AGE"],
+        "CONN_HEALTH_CHECKS": True,
+        "TEST": {"MIRROR": "default"},
     }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ["config.replicas.ReplicaRouter"]
+
+# Seconds the client reads from the default database after the write.
+REPLICA_STICKY_SECONDS = int(os.getenv("REPLICA_STICKY_SECONDS", 5))
+
+# Seconds between the flows polls and the duration of the single sepulka
+# events stream (see `sepulka.async_views.SepulkaEventsAsyncView`).
+SEPULKA_EVENTS_POLL_INTERVAL = float(
+    os.getenv("SEPULKA_EVENTS_POLL_INTERVAL", 1),
+)
+SEPULKA_EVENTS_MAX_SECONDS = int(os.getenv("SEPULKA_EVENTS_MAX_SECONDS", 300))
+
+# Enables the `config.metrics.RequestMetricsMiddleware` and the `/metrics/`
+# endpoint.
+REQUEST_METRICS = os.getenv("REQUEST_METRICS") == "True"
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "sepulka": {
+        "BACKEND": "sepulka.cache.InstrumentedLocMemCache",
+        "LOCATION": "sepulka",
+        "TIMEOUT": 60 * 60,
+        "OPTIONS": {
+            "MAX_ENTRIES": int(os.getenv("SEPULKA_CACHE_MAX_ENTRIES", 10000)),
+        },
+    },
 }
 
+if os.getenv("REDIS_URL"):
+    CACHES["default"] = {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.getenv("REDIS_URL"),
+    }
+    CACHES["sepulka"] = {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.getenv("REDIS_URL"),
+        "TIMEOUT": 60 * 60,
+        "KEY_PREFIX": "sepulka",
+    }
+
+# Cache alias of the sepulka detail payloads (see `sepulka.cache`).
+SEPULKA_DETAIL_CACHE = "sepulka"
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -138,11 +228,22 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = "account.User"
 
+# Seconds the authenticated token is cached by the
+# `account.authentication.CachedTokenAuthentication`.
+TOKEN_CACHE_TIMEOUT = int(os.getenv("TOKEN_CACHE_TIMEOUT", 300))
+
+# Seconds the user role and staff flags are cached by the `account.roles`.
+USER_FLAGS_CACHE_TIMEOUT = int(os.getenv("USER_FLAGS_CACHE_TIMEOUT", 300))
+
 
 # Django REST Framework
 # https://www.django-rest-framework.org/api-guide/settings/
 
 REST_FRAMEWORK = {
+    "DEFAULT_AUTHENTICATION_CLASSES": (
+        "account.authentication.CachedTokenAuthentication",
+        "rest_framework.authentication.SessionAuthentication",
+    ),
     "DEFAULT_PERMISSION_CLASSES": (
         "rest_framework.permissions.IsAuthenticated",
     ),
@@ -24,8 +24,14 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path("users/", include("account.urls")),
     path("sepulki/", include("sepulka.urls")),
+    path("async/sepulki/", include("sepulka.async_urls")),
 ]
 
+if settings.REQUEST_METRICS:
+    from config.metrics import MetricsView
+
+    urlpatterns.append(path("metrics/", MetricsView.as_view()))
+
 if settings.DEBUG:
     urlpatterns.append(
         path('rest-auth/', include("rest_framework.urls")),
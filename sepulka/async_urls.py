@@ -0,0 +1,22 @@
+from django.urls import path
+
+from sepulka.async_views import (SepulkaEventsAsyncView,
+                                 SepulkaFlowListAsyncView,
+                                 SepulkaListAsyncView,
+                                 SepulkaRetrieveAsyncView)
+
+urlpatterns = [
+    path("", SepulkaListAsyncView.as_view(), name="sepulka-async-list"),
+    path(
+        "events/", SepulkaEventsAsyncView.as_view(),
+        name="sepulka-async-events",
+    ),
+    path(
+        "<uuid:pk>/", SepulkaRetrieveAsyncView.as_view(),
+        name="sepulka-async-detail",
+    ),
+    path(
+        "<uuid:pk>/list_flow/", SepulkaFlowListAsyncView.as_view(),
+        name="sepulka-async-list-flow",
+    ),
+]
@@ -0,0 +1,458 @@
+import asyncio
+import json
+import time
+from collections import deque
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Count, Max, Q
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.utils.translation import gettext_lazy as _
+from django.views import View
+from rest_framework import exceptions, status
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from config.metrics import serializer_timing
+from sepulka import flow, pagination
+from sepulka.conditional import (get_not_modified_response, make_etag,
+                                 set_validators)
+from sepulka.filters import SepulkaFilterBackend
+from sepulka.models import Flow, Sepulka
+from sepulka.serializers import (FlowSerializer,
+                                 SepulkaDetailRetrieveSerializer,
+                                 SepulkaEventsSerializer,
+                                 SepulkaRetrieveValuesSerializer)
+
+
+class AsyncSepulkaView(View):
+    """Base view of the native async read-only sepulka endpoints.
+
+    Authenticates the request by the `DEFAULT_AUTHENTICATION_CLASSES` as the
+    viewsets do. Authenticators providing the `aauthenticate` method (e.g.
+    `CachedTokenAuthentication`) use the async cache and ORM API, so under
+    ASGI the token authenticated request is handled without `sync_to_async`
+    thread hops, other ones (e.g. the session authentication) are called by
+    the `sync_to_async`. Allows access for the authenticated users only, as
+    the `IsAuthenticated` default permission of the viewsets.
+
+    Responses match the `SepulkaViewSet` ones.
+    """
+
+    http_method_names = ["get", "head", "options"]
+
+    authentication_classes = api_settings.DEFAULT_AUTHENTICATION_CLASSES
+
+    cursor_pagination_class = pagination.SepulkaCursorPagination
+    """Pagination class used if the client requested the cursor pagination."""
+    pagination_query_param = "pagination"
+
+    def get_authenticators(self):
+        return [auth() for auth in self.authentication_classes]
+
+    async def authenticate(self, request):
+        """Return `(user, auth)` pair of the first authenticator accepted the
+        request or `None`."""
+        drf_request = Request(request, authenticators=())
+
+        for authenticator in self.get_authenticators():
+            if hasattr(authenticator, "aauthenticate"):
+                auth = await authenticator.aauthenticate(request)
+            else:
+                auth = await sync_to_async(authenticator.authenticate)(
+                    drf_request,
+                )
+
+            if auth is not None:
+                return auth
+
+        return None
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            auth = await self.authenticate(request)
+
+            if auth is None:
+                raise exceptions.NotAuthenticated()
+
+            request.user, request.auth = auth
+
+            return await super().dispatch(request, *args, **kwargs)
+        except Http404:
+            return self.get_error_response(exceptions.NotFound())
+        except exceptions.APIException as error:
+            return self.get_error_response(error)
+
+    def get_error_response(self, error):
+        detail = error.detail
+
+        if not isinstance(detail, (list, dict)):
+            detail = {"detail": detail}
+
+        response = self.get_response(detail, status=error.status_code)
+
+        if isinstance(error, (
+            exceptions.NotAuthenticated, exceptions.AuthenticationFailed,
+        )):
+            # As `APIView.handle_exception`, the first authenticator header
+            # or `403 Forbidden` if it has no header.
+            authenticators = self.get_authenticators()
+            header = authenticators and authenticators[0].authenticate_header(
+                self.request,
+            )
+
+            if header:
+                response.headers["WWW-Authenticate"] = header
+            else:
+                response.status_code = status.HTTP_403_FORBIDDEN
+
+        return response
+
+    def get_response(self, data, status=200):
+        return JsonResponse(data, status=status, encoder=JSONEncoder, safe=False)
+
+    def is_cursor_paginated(self):
+        return self.request.GET.get(self.pagination_query_param) == "cursor"
+
+    def paginate_cursor(self, queryset, serializer_class):
+        """Return the serialized `cursor_pagination_class` page of the given
+        queryset.
+
+        The paginator is sync, so the method is called by the
+        `sync_to_async`.
+        """
+        paginator = self.cursor_pagination_class()
+        page = paginator.paginate_queryset(
+            queryset, Request(self.request, authenticators=()), view=self,
+        )
+
+        with serializer_timing():
+            data = serializer_class(page, many=True).data
+
+        return paginator.get_paginated_response(data).data
+
+    async def paginate(self, queryset, serializer_class):
+        """Return the serialized page of the given queryset.
+
+        Uses the `cursor_pagination_class` if the `pagination_query_param`
+        query param equals to 'cursor'. Otherwise paginates the same way
+        the `PageNumberPagination` does: returns all objects if `PAGE_SIZE`
+        setting is not set, the `page` page with `count`, `next` and
+        `previous` fields otherwise.
+        """
+        if self.is_cursor_paginated():
+            return await sync_to_async(self.paginate_cursor)(
+                queryset, serializer_class,
+            )
+
+        page_size = api_settings.PAGE_SIZE
+
+        if not page_size:
+            rows = [row async for row in queryset]
+
+            with serializer_timing():
+                return serializer_class(rows, many=True).data
+
+        page = self.request.GET.get("page", "1")
+        if not page.isdigit() or int(page) < 1:
+            raise exceptions.NotFound(_("Invalid page."))
+        page = int(page)
+
+        count = await queryset.acount()
+        offset = (page - 1) * page_size
+
+        if offset and offset >= count:
+            raise exceptions.NotFound(_("Invalid page."))
+
+        url = self.request.build_absolute_uri()
+        rows = [row async for row in queryset[offset:offset + page_size]]
+
+        previous = None
+        if page == 2:
+            previous = remove_query_param(url, "page")
+        elif page > 2:
+            previous = replace_query_param(url, "page", page - 1)
+
+        with serializer_timing():
+            results = serializer_class(rows, many=True).data
+
+        return {
+            "count": count,
+            "next": (
+                replace_query_param(url, "page", page + 1)
+                if offset + page_size < count else None
+            ),
+            "previous": previous,
+            "results": results,
+        }
+
+
+class SepulkaListAsyncView(AsyncSepulkaView):
+    """Async version of the `SepulkaViewSet.list` endpoint."""
+
+    action = "list"
+
+    async def get(self, request, *args, **kwargs):
+        drf_request = Request(request, authenticators=())
+        drf_request.user = request.user
+
+        queryset = Sepulka.live.filter(
+            **SepulkaFilterBackend().get_filters(drf_request, self),
+        )
+
+        # Cursor pages are served without validators, as by the viewset.
+        etag = last_modified = None
+
+        if not self.is_cursor_paginated():
+            aggregate = await queryset.aaggregate(
+                count=Count("pk"), last_modified=Max("date_updated"),
+                creators_modified=Max("creator__date_updated"),
+            )
+            etag = make_etag(
+                request.get_full_path(), request.user.pk,
+                aggregate["count"], aggregate["last_modified"],
+                aggregate["creators_modified"],
+            )
+            last_modified = max((
+                date for date in [
+                    aggregate["last_modified"], aggregate["creators_modified"],
+                ] if date
+            ), default=None)
+
+        response = get_not_modified_response(request, etag, last_modified)
+        if response is not None:
+            return response
+
+        data = await self.paginate(
+            SepulkaRetrieveValuesSerializer.get_queryset(queryset),
+            SepulkaRetrieveValuesSerializer,
+        )
+        return set_validators(self.get_response(data), etag, last_modified)
+
+
+class SepulkaRetrieveAsyncView(AsyncSepulkaView):
+    """Async version of the `SepulkaViewSet.retrieve` endpoint."""
+
+    action = "retrieve"
+
+    async def get(self, request, pk, *args, **kwargs):
+        values = await Sepulka.live.filter(pk=pk).values_list(
+            *SepulkaDetailRetrieveSerializer.version_fields,
+        ).afirst()
+
+        if not values:
+            raise exceptions.NotFound()
+
+        etag = make_etag(pk, *values)
+        last_modified = max(date for date in values[:3] if date)
+
+        response = get_not_modified_response(request, etag, last_modified)
+        if response is not None:
+            return response
+
+        try:
+            instance = await SepulkaDetailRetrieveSerializer.get_queryset(
+                Sepulka.live.all(),
+            ).aget(pk=pk)
+        except Sepulka.DoesNotExist:
+            raise exceptions.NotFound()
+
+        with serializer_timing():
+            data = SepulkaDetailRetrieveSerializer(instance).data
+
+        return set_validators(self.get_response(data), etag, last_modified)
+
+
+class SepulkaFlowListAsyncView(AsyncSepulkaView):
+    """Async version of the `SepulkaViewSet.list_flow` endpoint."""
+
+    action = "list_flow"
+
+    cursor_pagination_class = pagination.FlowCursorPagination
+
+    async def get(self, request, pk, *args, **kwargs):
+        if not await Sepulka.live.filter(pk=pk).aexists():
+            raise exceptions.NotFound()
+
+        queryset = Flow.objects.filter(sepulka_id=pk)
+
+        aggregate = await queryset.aaggregate(
+            count=Count("id"), last_id=Max("id"),
+            last_modified=Max("date_created"),
+        )
+        etag = make_etag(
+            request.get_full_path(), aggregate["count"], aggregate["last_id"],
+        )
+        last_modified = aggregate["last_modified"]
+
+        response = get_not_modified_response(request, etag, last_modified)
+        if response is not None:
+            return response
+
+        data = await self.paginate(
+            queryset.order_by(*self.cursor_pagination_class.ordering),
+            FlowSerializer,
+        )
+        return set_validators(self.get_response(data), etag, last_modified)
+
+
+class SepulkaEventsAsyncView(AsyncSepulkaView):
+    """Stream the sepulka flows as the Server-Sent Events.
+
+    Each event is the `Flow` row with the current sepulka state, its id is
+    the flow id, so the reconnecting client resumes by the `Last-Event-ID`
+    header (or `last_event_id` query param). New streams start after the
+    last existing flow.
+
+    The stream is the async generator polling the `id > cursor` flows by
+    the primary key every `SEPULKA_EVENTS_POLL_INTERVAL` seconds. With the
+    shared cache the poll query is skipped while the flows version (see
+    `flow.aget_version`) is not changed, so idle streams rarely query the
+    database. Ids can be committed out of order, so the flows of the last
+    `safety_lag` seconds behind the cursor are polled again and the
+    missed ones are sent late. The stream is closed after
+    `SEPULKA_EVENTS_MAX_SECONDS`, then the client reconnects.
+    """
+
+    action = "events"
+
+    batch_size = 100
+    """Maximum number of the flows fetched by the single poll."""
+
+    heartbeat_interval = 15
+    """Seconds between the keep-alive comments of the idle stream."""
+
+    version_max_age = 10
+    """Seconds the flows version skips the poll query at most.
+
+    So the flows created without the version change (e.g. by the
+    `bulk_create` outside `flow.FlowBuffer`) are sent late instead of never.
+    """
+
+    safety_lag = 5
+    """Seconds the polled flows behind the cursor are checked again.
+
+    Flow ids are taken before the transaction commit, so the younger id can
+    be visible before the older one.
+    """
+
+    async def get(self, request, *args, **kwargs):
+        drf_request = Request(request, authenticators=())
+        drf_request.user = request.user
+
+        serializer = SepulkaEventsSerializer(
+            data=request.GET, context={"request": drf_request, "view": self},
+        )
+        with serializer_timing():
+            serializer.is_valid(raise_exception=True)
+        options = serializer.validated_data
+
+        queryset = Flow.objects.all()
+
+        if options.get("codes"):
+            queryset = queryset.filter(sepulka_id__in=options["codes"])
+
+        if "responsible" in options:
+            queryset = queryset.filter(
+                Q(sepulka__process__responsible=options["responsible"])
+                | Q(sepulka__delivery__responsible=options["responsible"]),
+            )
+
+        cursor = request.headers.get("Last-Event-ID", "")
+
+        if cursor.isdigit():
+            cursor = int(cursor)
+        elif "last_event_id" in options:
+            cursor = options["last_event_id"]
+        else:
+            cursor = await Flow.objects.aaggregate(last_id=Max("id"))
+            cursor = cursor["last_id"] or 0
+
+        response = StreamingHttpResponse(
+            self.stream(queryset, cursor), content_type="text/event-stream",
+        )
+        response.headers["Cache-Control"] = "no-cache"
+        response.headers["X-Accel-Buffering"] = "no"
+        return response
+
+    def format_event(self, row):
+        data = {
+            "id": row["id"],
+            "sepulka": str(row["sepulka_id"]),
+            "state": row["sepulka__state"],
+            "message": row["message"],
+            "date_created": row["date_created"],
+        }
+
+        return (
+            f"id: {row['id']}\nevent: flow\n"
+            f"data: {json.dumps(data, cls=JSONEncoder)}\n\n"
+        )
+
+    async def stream(self, queryset, cursor):
+        poll_interval = settings.SEPULKA_EVENTS_POLL_INTERVAL
+        deadline = time.monotonic() + settings.SEPULKA_EVENTS_MAX_SECONDS
+        heartbeat = time.monotonic() + self.heartbeat_interval
+        version = None
+        version_expires = 0
+        # `(time, cursor)` pairs of the last `safety_lag` polls, the oldest
+        # cursor is the floor of the polled ids, the sent ids above the
+        # floor are skipped.
+        checkpoints = deque([(time.monotonic(), cursor)])
+        sent = set()
+
+        yield f"retry: {int(poll_interval * 1000)}\n\n"
+
+        while time.monotonic() < deadline:
+            current_version = await flow.aget_version()
+            now = time.monotonic()
+
+            if (
+                current_version is None or current_version != version
+                or now >= version_expires
+            ):
+                version = current_version
+                version_expires = now + self.version_max_age
+
+                while (
+                    len(checkpoints) > 1
+                    and checkpoints[1][0] <= now - self.safety_lag
+                ):
+                    checkpoints.popleft()
+
+                floor = checkpoints[0][1]
+                sent = {pk for pk in sent if pk > floor}
+                limit = self.batch_size + len(sent)
+
+                rows = [
+                    row async for row in queryset.filter(id__gt=floor)
+                    .order_by("id")
+                    .values(
+                        "id", "sepulka_id", "sepulka__state",
+                        "message", "date_created",
+                    )[:limit]
+                ]
+
+                for row in rows:
+                    if row["id"] in sent:
+                        continue
+
+                    sent.add(row["id"])
+                    cursor = max(cursor, row["id"])
+                    heartbeat = time.monotonic() + self.heartbeat_interval
+                    yield self.format_event(row)
+
+                checkpoints.append((now, cursor))
+
+                if len(rows) == limit:
+                    # More flows are waiting, poll again immediately.
+                    version = None
+                    continue
+
+            if time.monotonic() >= heartbeat:
+                heartbeat = time.monotonic() + self.heartbeat_interval
+                yield ": keep-alive\n\n"
+
+            await asyncio.sleep(poll_interval)
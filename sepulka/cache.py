@@ -0,0 +1,65 @@
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+
+stats = Counter()
+"""Detail cache `hits`, `misses` and `evictions` counters of the process."""
+
+
+class InstrumentedLocMemCache(LocMemCache):
+    """Local memory cache counting the evicted entries.
+
+    `LocMemCache` evicts the least recently used entries when the cache
+    reaches `MAX_ENTRIES`, the number of evicted entries is added to the
+    `stats` counters.
+    """
+
+    def _cull(self):
+        size = len(self._cache)
+        super()._cull()
+        stats["evictions"] += size - len(self._cache)
+
+
+def get_cache():
+    return caches[settings.SEPULKA_DETAIL_CACHE]
+
+
+def get_detail_key(code, etag):
+    return f"sepulka:detail:{code}:{etag}"
+
+
+def get_detail(code, etag):
+    """Return the sepulka detail payload cached by the given entity tag.
+
+    The entity tag (see `SepulkaViewSet.get_retrieve_validators`) is
+    computed from the database by every request and changes with any
+    rendered field of the sepulka and of the related rows (e.g. the
+    responsible username), so the payload of the changed sepulka is never
+    found and no invalidation is needed. The default `LocMemCache` is per
+    process, so every worker fills its own entries, the shared backend
+    (e.g. Redis, see `REDIS_URL`) shares them between the workers.
+
+    Returns:
+        The payload or `None` if it is not cached.
+    """
+    payload = get_cache().get(get_detail_key(code, etag))
+    stats["hits" if payload is not None else "misses"] += 1
+    return payload
+
+
+def set_detail(code, etag, payload):
+    """Cache the sepulka detail payload by the given entity tag."""
+    get_cache().set(get_detail_key(code, etag), payload)
+
+
+def get_stats():
+    requests = stats["hits"] + stats["misses"]
+
+    return {
+        "hits": stats["hits"],
+        "misses": stats["misses"],
+        "evictions": stats["evictions"],
+        "hit_ratio": stats["hits"] / requests if requests else None,
+    }
@@ -0,0 +1,166 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from sepulka.models import Delivery, Process, Sepulka
+
+TABLES = {
+    "sepulki": (Sepulka, (
+        "code", "name", "creator_id", "state", "is_warm", "is_square",
+        "is_soft", "size", "date_created", "date_updated",
+    )),
+    "processes": (Process, (
+        "id", "sepulka_id", "responsible_id", "is_vaccinated",
+        "is_processed", "date_updated",
+    )),
+    "deliveries": (Delivery, (
+        "id", "sepulka_id", "responsible_id", "method", "date_updated",
+    )),
+}
+"""Map of the synced table name to the model and the returned fields."""
+
+
+def encode_watermark(cursors):
+    """Return the opaque watermark of the given table cursors.
+
+    Args:
+        cursors: Map of the table name to the `(date_updated, pk)` pair of
+            the last synced row.
+    """
+    data = {
+        table: [date_updated.isoformat(), str(pk)]
+        for table, (date_updated, pk) in cursors.items()
+    }
+
+    return base64.urlsafe_b64encode(
+        json.dumps(data, separators=(",", ":")).encode(),
+    ).decode()
+
+
+def decode_watermark(watermark):
+    """Return the table cursors of the given watermark.
+
+    Raises:
+        ValueError: If the watermark is invalid.
+    """
+    try:
+        data = json.loads(base64.urlsafe_b64decode(watermark.encode()))
+    except (binascii.Error, UnicodeError, json.JSONDecodeError):
+        raise ValueError("Invalid watermark.")
+
+    if not isinstance(data, dict) or not data.keys() <= TABLES.keys():
+        raise ValueError("Invalid watermark.")
+
+    cursors = {}
+
+    for table, cursor in data.items():
+        if not isinstance(cursor, list) or len(cursor) != 2:
+            raise ValueError("Invalid watermark.")
+
+        try:
+            date_updated = parse_datetime(str(cursor[0]))
+        except ValueError:
+            date_updated = None
+
+        if date_updated is None or timezone.is_naive(date_updated):
+            raise ValueError("Invalid watermark.")
+
+        model = TABLES[table][0]
+
+        try:
+            pk = model._meta.pk.to_python(cursor[1])
+        except ValidationError:
+            raise ValueError("Invalid watermark.")
+
+        cursors[table] = (date_updated, pk)
+
+    return cursors
+
+
+def get_changed_rows(queryset, cursor, until, limit, fields):
+    """Return up to `limit` rows of the queryset changed after the cursor.
+
+    Rows are ordered by the `(date_updated, pk)` pair, the cursor is the
+    pair of the last synced row, so the query is the keyset scan of the
+    `date_updated` index. Rows changed at `until` or later are skipped.
+    """
+    if cursor is not None:
+        date_updated, pk = cursor
+        queryset = queryset.filter(
+            Q(date_updated__gt=date_updated)
+            | Q(date_updated=date_updated, pk__gt=pk),
+        )
+
+    return list(
+        queryset.filter(date_updated__lt=until)
+        .order_by("date_updated", "pk")
+        .values("pk", *fields)[:limit]
+    )
+
+
+def get_changes(filters, cursors, until, limit):
+    """Return the sepulki, processes and deliveries changed after the
+    given cursors.
+
+    Args:
+        filters: Sepulka lookups limiting the synced sepulki.
+        cursors: Map of the table name to its cursor (see
+            `decode_watermark`), missing tables are synced from scratch.
+        until: Rows changed at this time or later are left for the next
+            sync, so the rows committed late with the earlier
+            `date_updated` are not skipped.
+        limit: Maximum number of rows of each table.
+
+    Returns:
+        Map of the table name to the changed rows, `deleted` list of the
+        safely deleted sepulki codes (tombstones), new `watermark` and
+        `has_more` flag, true if any table has more changes.
+    """
+    related_filters = {
+        f"sepulka__{lookup}": value for lookup, value in filters.items()
+    }
+    changes = {"deleted": []}
+    cursors = dict(cursors)
+    has_more = False
+
+    for table, (model, fields) in TABLES.items():
+        if model is Sepulka:
+            queryset = Sepulka.objects.filter(**filters)
+        else:
+            queryset = model.objects.filter(**related_filters).exclude(
+                sepulka__state=Sepulka.StateChoice.DELETED,
+            )
+
+        rows = get_changed_rows(
+            queryset, cursors.get(table), until, limit, fields,
+        )
+
+        if rows:
+            cursors[table] = (rows[-1]["date_updated"], rows[-1]["pk"])
+
+        has_more = has_more or len(rows) == limit
+
+        if model is Sepulka:
+            changes["deleted"] = [
+                row["code"] for row in rows
+                if row["state"] == Sepulka.StateChoice.DELETED
+            ]
+            rows = [
+                row for row in rows
+                if row["state"] != Sepulka.StateChoice.DELETED
+            ]
+
+        for row in rows:
+            del row["pk"]
+
+        changes[table] = rows
+
+    changes["watermark"] = encode_watermark(cursors) if cursors else None
+    changes["has_more"] = has_more
+
+    return changes
@@ -0,0 +1,72 @@
+from django.db import connections, router
+from django.utils import timezone
+from django.utils.translation import gettext
+
+from sepulka import flow, transitions
+from sepulka.models import (Delivery, Process, Sepulka, atomic_for_update,
+                            select_for_update_of_self)
+
+CLAIMABLE_STATES = {
+    Process: Sepulka.StateChoice.CREATED,
+    Delivery: Sepulka.StateChoice.PROCESSED,
+}
+"""Sepulka state in which its process or delivery can be claimed."""
+
+
+def get_claimable_queryset(model):
+    """Return the unassigned rows of the `Process` or `Delivery` model
+    ready to be claimed, the oldest sepulki first."""
+    return (
+        model.objects
+        .filter(
+            responsible__isnull=True,
+            sepulka__state=CLAIMABLE_STATES[model],
+        )
+        .order_by("sepulka__date_created", "pk")
+    )
+
+
+def claim(model, user, count):
+    """Assign up to `count` unassigned rows of the model to the user.
+
+    On backends supporting `SELECT ... FOR UPDATE SKIP LOCKED` the rows are
+    picked and locked by the single query, so the concurrent workers pick
+    the different rows without waiting for each other. On other backends
+    the picked rows are locked by `SELECT ... FOR UPDATE` (SQLite
+    transactions hold the database write lock, see
+    `sepulka.models.atomic_for_update`), so the concurrent workers are
+    serialized. The picked rows are assigned by their primary keys in the
+    same transaction.
+
+    Records the flows and advances the claimed sepulki state.
+
+    Returns:
+        List of codes of the claimed sepulki.
+    """
+    connection = connections[router.db_for_write(model)]
+    queryset = get_claimable_queryset(model)
+
+    with atomic_for_update():
+        if connection.features.has_select_for_update_skip_locked:
+            queryset = select_for_update_of_self(queryset, skip_locked=True)
+        elif connection.features.has_select_for_update:
+            queryset = select_for_update_of_self(queryset)
+
+        picked = list(queryset.values_list("pk", "sepulka_id")[:count])
+        model.objects.filter(pk__in=[pk for pk, _ in picked]).update(
+            responsible=user, date_updated=timezone.now(),
+        )
+        claimed = [code for _, code in picked]
+
+        if claimed:
+            flow.record_many(claimed, gettext(
+                "%(model)s %(field)s: %(old)s -> %(new)s.",
+            ) % {
+                "model": model._meta.verbose_name.capitalize(),
+                "field": model._meta.get_field("responsible").verbose_name,
+                "old": flow.format_value(None),
+                "new": flow.format_value(user),
+            })
+            transitions.advance(claimed)
+
+    return claimed
@@ -0,0 +1,87 @@
+import hashlib
+from functools import wraps
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+def make_etag(*parts):
+    """Return the quoted entity tag built from the given parts."""
+    digest = hashlib.md5(
+        "|".join(str(part) for part in parts).encode(),
+        usedforsecurity=False,
+    )
+    return quote_etag(digest.hexdigest())
+
+
+def get_not_modified_response(request, etag, last_modified):
+    """Return `304 Not Modified` response if the request preconditions match.
+
+    Args:
+        request: The request instance.
+        etag: The quoted entity tag of the response or `None`.
+        last_modified: The response last modification datetime or `None`.
+
+    Returns:
+        The response if the request preconditions match, `None` otherwise.
+    """
+    return get_conditional_response(
+        request, etag=etag,
+        last_modified=last_modified and int(last_modified.timestamp()),
+    )
+
+
+def set_validators(response, etag, last_modified):
+    """Set `ETag` and `Last-Modified` headers of the successful response."""
+    if response.status_code != 200:
+        return response
+
+    if etag and not response.has_header("ETag"):
+        response.headers["ETag"] = etag
+
+    if last_modified and not response.has_header("Last-Modified"):
+        response.headers["Last-Modified"] = http_date(
+            int(last_modified.timestamp()),
+        )
+
+    return response
+
+
+def conditional_get(validators_method):
+    """Answer conditional `GET` and `HEAD` requests of the viewset method.
+
+    Similar to the `django.views.decorators.http.condition` decorator, but
+    the validators are computed by the viewset method with the
+    `validators_method` name. The method is called with the decorated
+    method arguments and returns `(etag, last_modified)` pair, any of them
+    may be `None`.
+
+    Returns `304 Not Modified` response without calling the decorated
+    method if the request preconditions match, sets `ETag` and
+    `Last-Modified` headers of the decorated method response otherwise.
+    The decorated method reads the pair from the `validators` attribute of
+    the viewset (e.g. to cache the response by the entity tag).
+    """
+
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD"):
+                return method(self, request, *args, **kwargs)
+
+            etag, last_modified = getattr(self, validators_method)(
+                request, *args, **kwargs,
+            )
+            self.validators = etag, last_modified
+
+            response = get_not_modified_response(request, etag, last_modified)
+            if response is not None:
+                return response
+
+            return set_validators(
+                method(self, request, *args, **kwargs), etag, last_modified,
+            )
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,270 @@
+import random
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+
+SHARDS = 8
+"""Number of rows per counter key.
+
+Every delta is added to the random shard, so the concurrent transactions
+updating the same counter rarely wait for each other's row lock.
+"""
+
+PROCESS_FLAGS = ("is_processed", "is_vaccinated")
+"""Process fields whose `True` values are counted."""
+
+COUNTED_VALUES = (
+    "state", "size", "process__is_processed", "process__is_vaccinated",
+    "delivery__method",
+)
+"""Sepulka (and the related rows) values the counters depend on."""
+
+
+def get_state_key(state):
+    return f"state:{state}"
+
+
+def get_size_key(size):
+    return f"size:{size}"
+
+
+def get_method_key(method):
+    return f"method:{method}"
+
+
+def add(deltas):
+    """Add the given deltas to the counters in the current transaction.
+
+    Args:
+        deltas: Map of the counter key to the delta. Zero deltas are
+            skipped.
+    """
+    from sepulka.models import SepulkaCounter
+
+    shard = random.randrange(SHARDS)
+
+    # Keys are updated in the same order by all transactions to avoid
+    # the deadlocks.
+    for key, delta in sorted(deltas.items()):
+        if not delta:
+            continue
+
+        queryset = SepulkaCounter.objects.filter(key=key, shard=shard)
+
+        if queryset.update(value=F("value") + delta):
+            continue
+
+        try:
+            with transaction.atomic():
+                SepulkaCounter.objects.create(key=key, shard=shard, value=delta)
+        except IntegrityError:
+            # Created by the concurrent transaction.
+            queryset.update(value=F("value") + delta)
+
+
+def get_created_deltas(sepulki):
+    """Return the counter deltas of the given just created sepulki."""
+    deltas = Counter()
+
+    for sepulka in sepulki:
+        deltas[get_state_key(sepulka.state)] += 1
+        deltas[get_size_key(sepulka.size)] += 1
+
+    return deltas
+
+
+def get_live_deltas(values, sign=1):
+    """Return the counter deltas of the live sepulka (counted by the `size`,
+    process flags and delivery method counters) multiplied by `sign`.
+
+    Args:
+        values: Map of the `COUNTED_VALUES` to the sepulka values.
+    """
+    deltas = Counter({
+        get_size_key(values["size"]): sign,
+        "is_processed": sign * int(values["process__is_processed"]),
+        "is_vaccinated": sign * int(values["process__is_vaccinated"]),
+    })
+
+    if values["delivery__method"] is not None:
+        deltas[get_method_key(values["delivery__method"])] += sign
+
+    return deltas
+
+
+def get_sepulka_change_deltas(old_values, new_values):
+    """Return the counter deltas of the sepulka `state` or `size` change.
+
+    The deleted sepulka is counted by the `state` counters only.
+
+    Args:
+        old_values: Map of the `COUNTED_VALUES` to the saved values.
+        new_values: Map of the `COUNTED_VALUES` to the new values.
+    """
+    from sepulka.models import Sepulka
+
+    deltas = Counter({get_state_key(old_values["state"]): -1})
+    deltas[get_state_key(new_values["state"])] += 1
+
+    for values, sign in ((old_values, -1), (new_values, 1)):
+        if values["state"] != Sepulka.StateChoice.DELETED:
+            deltas.update(get_live_deltas(values, sign))
+
+    return deltas
+
+
+def get_removed_deltas(rows):
+    """Return the counter deltas of the hard deleted sepulki.
+
+    Args:
+        rows: Maps of the `COUNTED_VALUES` to the deleted sepulki values.
+    """
+    from sepulka.models import Sepulka
+
+    deltas = Counter()
+
+    for values in rows:
+        deltas[get_state_key(values["state"])] -= 1
+
+        if values["state"] != Sepulka.StateChoice.DELETED:
+            deltas.update(get_live_deltas(values, -1))
+
+    return deltas
+
+
+def get_change_deltas(model, changes):
+    """Return the counter deltas of the live `Process` or `Delivery` rows
+    changes.
+
+    Args:
+        model: `Process` or `Delivery` model.
+        changes: Iterable of `(old values, new values)` pairs of the field
+            name to value maps.
+    """
+    from sepulka.models import Process
+
+    deltas = Counter()
+
+    for old_values, new_values in changes:
+        if model is Process:
+            for field in PROCESS_FLAGS:
+                if field in new_values:
+                    deltas[field] += (
+                        int(new_values[field]) - int(old_values[field])
+                    )
+        elif "method" in new_values:
+            for method, delta in (
+                (old_values["method"], -1), (new_values["method"], 1),
+            ):
+                if method is not None:
+                    deltas[get_method_key(method)] += delta
+
+    return deltas
+
+
+def count():
+    """Return the counter values computed by the full tables scan."""
+    from sepulka.models import Sepulka
+
+    values = Counter()
+    live = Sepulka.live.all()
+
+    for row in Sepulka.objects.values("state").annotate(total=Count("pk")):
+        values[get_state_key(row["state"])] = row["total"]
+
+    for row in live.values("size").annotate(total=Count("pk")):
+        values[get_size_key(row["size"])] = row["total"]
+
+    for row in (
+        live.filter(delivery__method__isnull=False)
+        .values("delivery__method").annotate(total=Count("pk"))
+    ):
+        values[get_method_key(row["delivery__method"])] = row["total"]
+
+    values.update(live.aggregate(**{
+        field: Count("pk", filter=Q(**{f"process__{field}": True}))
+        for field in PROCESS_FLAGS
+    }))
+
+    return +values
+
+
+def get_values():
+    """Return the current counter values (shards summed up)."""
+    from sepulka.models import SepulkaCounter
+
+    return Counter({
+        key: total
+        for key, total in SepulkaCounter.objects.values("key")
+        .annotate(total=Sum("value")).values_list("key", "total")
+        if total
+    })
+
+
+def rebuild():
+    """Replace the counters by the values computed from scratch.
+
+    Returns:
+        Mismatched counters (see `get_mismatches`).
+    """
+    from sepulka.models import SepulkaCounter, atomic_for_update
+
+    with atomic_for_update():
+        # Lock the counters, so the concurrent deltas wait for the rebuild.
+        list(SepulkaCounter.objects.select_for_update().values_list("pk"))
+
+        stored = get_values()
+        computed = count()
+
+        SepulkaCounter.objects.all().delete()
+        SepulkaCounter.objects.bulk_create(
+            SepulkaCounter(key=key, shard=0, value=value)
+            for key, value in computed.items()
+        )
+
+    return get_mismatches(stored, computed)
+
+
+def get_mismatches(stored, computed):
+    """Return map of the key to the `(stored, computed)` values pair of
+    the mismatched counters."""
+    return {
+        key: (stored[key], computed[key])
+        for key in stored.keys() | computed.keys()
+        if stored[key] != computed[key]
+    }
+
+
+def get_stats():
+    """Return the sepulki statistics read from the counters."""
+    from sepulka.models import Delivery, Sepulka
+
+    values = get_values()
+
+    states = {
+        state: values[get_state_key(state)] for state in Sepulka.StateChoice
+    }
+    live = sum(states.values()) - states[Sepulka.StateChoice.DELETED]
+    methods = {
+        method: values[get_method_key(method)]
+        for method in Delivery.MethodChoice
+    }
+
+    return {
+        "total": sum(states.values()),
+        "live": live,
+        "state": states,
+        "size": {
+            size: values[get_size_key(size)]
+            for size in Sepulka.SizeChoice
+        },
+        "delivery_method": {**methods, None: live - sum(methods.values())},
+        **{
+            field: values[field] for field in PROCESS_FLAGS
+        },
+        **{
+            f"{field}_ratio": values[field] / live if live else None
+            for field in PROCESS_FLAGS
+        },
+    }
@@ -0,0 +1,93 @@
+import csv
+import json
+from collections import defaultdict
+from itertools import islice
+
+from rest_framework.utils.encoders import JSONEncoder
+
+from sepulka.models import Flow
+
+EXPORT_FIELDS = {
+    "code": "code",
+    "name": "name",
+    "creator": "creator__username",
+    "state": "state",
+    "is_warm": "is_warm",
+    "is_square": "is_square",
+    "is_soft": "is_soft",
+    "size": "size",
+    "date_created": "date_created",
+    "date_updated": "date_updated",
+    "process_responsible": "process__responsible__username",
+    "process_is_vaccinated": "process__is_vaccinated",
+    "process_is_processed": "process__is_processed",
+    "process_date_updated": "process__date_updated",
+    "delivery_method": "delivery__method",
+    "delivery_responsible": "delivery__responsible__username",
+    "delivery_date_updated": "delivery__date_updated",
+}
+"""Map of the exported fields to the sepulka queryset lookups."""
+
+
+def iter_rows(queryset, chunk_size=2000, with_flows=False):
+    """Iterate over the exported rows of the given sepulka queryset.
+
+    Fetches rows by the chunks of `chunk_size` using the queryset
+    `iterator`, so memory usage does not depend on the queryset size. If
+    `with_flows` is true, fetches flows of each chunk by the single query
+    and adds the list of their messages to the `flows` row field.
+    """
+    rows = queryset.values_list(*EXPORT_FIELDS.values()).iterator(
+        chunk_size=chunk_size,
+    )
+
+    while chunk := list(islice(rows, chunk_size)):
+        flows = defaultdict(list)
+
+        if with_flows:
+            for sepulka_id, message, date_created in Flow.objects.filter(
+                sepulka_id__in=[row[0] for row in chunk],
+            ).order_by("id").values_list("sepulka_id", "message", "date_created"):
+                flows[sepulka_id].append(
+                    {"message": message, "date_created": date_created},
+                )
+
+        for row in chunk:
+            row = dict(zip(EXPORT_FIELDS, row))
+
+            if with_flows:
+                row["flows"] = flows[row["code"]]
+
+            yield row
+
+
+def iter_ndjson(rows):
+    """Encode each of the given rows as the JSON line."""
+    encoder = JSONEncoder()
+
+    for row in rows:
+        yield encoder.encode(row) + "\n"
+
+
+class Echo:
+    """File-like object returning the written value instead of storing it."""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(rows, with_flows=False):
+    """Encode the header and each of the given rows as the CSV lines.
+
+    Flows are encoded as JSON list in the `flows` column.
+    """
+    fieldnames = [*EXPORT_FIELDS, *(["flows"] if with_flows else [])]
+    writer = csv.DictWriter(Echo(), fieldnames=fieldnames)
+
+    yield writer.writeheader()
+
+    for row in rows:
+        if with_flows:
+            row["flows"] = json.dumps(row["flows"], cls=JSONEncoder)
+
+        yield writer.writerow(row)
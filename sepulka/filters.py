@@ -0,0 +1,64 @@
+from rest_framework.filters import BaseFilterBackend
+
+from sepulka.serializers import SepulkaFilterSerializer
+
+
+class SepulkaFilterBackend(BaseFilterBackend):
+    """Filter sepulki by the request query params.
+
+    Validates query params with the `SepulkaFilterSerializer` and translates
+    them to the lookups covered by the `Sepulka` indexes (`state`, `creator`
+    and `date_created` columns, `name` prefix range) or by the
+    `Delivery.method` index.
+    """
+
+    lookups = {
+        "state": "state__in",
+        "size": "size__in",
+        "is_warm": "is_warm",
+        "is_square": "is_square",
+        "is_soft": "is_soft",
+        "creator": "creator_id",
+        "delivery_method": "delivery__method__in",
+        "date_created_after": "date_created__gte",
+        "date_created_before": "date_created__lt",
+        "name": "name__startswith",
+    }
+    """Map of the filter serializer fields to the queryset lookups."""
+
+    def get_prefix_range(self, prefix):
+        """Return the `(lower, upper)` bounds of the strings starting with the
+        given prefix.
+
+        Unlike `LIKE 'prefix%'` (case insensitive on SQLite), the range is
+        covered by the column index on every backend.
+        """
+        return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+    def get_filters(self, request, view):
+        serializer = SepulkaFilterSerializer(
+            data=request.query_params,
+            context={"request": request, "view": view},
+        )
+        serializer.is_valid(raise_exception=True)
+
+        filters = {
+            self.lookups[field]: value
+            for field, value in serializer.validated_data.items()
+            if value is not None
+        }
+
+        if serializer.validated_data.get("name"):
+            filters["name__gte"], filters["name__lt"] = self.get_prefix_range(
+                serializer.validated_data["name"],
+            )
+
+        return filters
+
+    def filter_queryset(self, request, queryset, view):
+        filters = self.get_filters(request, view)
+
+        if filters:
+            return queryset.filter(**filters)
+
+        return queryset
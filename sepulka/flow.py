@@ -0,0 +1,177 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import (iscoroutinefunction, markcoroutinefunction,
+                          sync_to_async)
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.utils.translation import gettext
+
+VERSION_CACHE_KEY = "sepulka:flow:version"
+"""Cache key of the version changed on every flows creation."""
+
+
+class FlowBuffer:
+    """Collect flow messages and create them by the single INSERT query."""
+
+    def __init__(self):
+        self.flows = []
+
+    def __len__(self):
+        return len(self.flows)
+
+    def append(self, sepulka_id, message):
+        self.flows.append((sepulka_id, message))
+
+    def flush(self):
+        """Create all collected flows with `bulk_create` and clear them."""
+        from sepulka.models import Flow
+
+        flows, self.flows = self.flows, []
+
+        if flows:
+            Flow.objects.bulk_create(
+                Flow(sepulka_id=sepulka_id, message=message[:256])
+                for sepulka_id, message in flows
+            )
+            # Notify the events streams (see `aget_version`).
+            cache.set(VERSION_CACHE_KEY, time.time_ns(), None)
+
+
+async def aget_version():
+    """Return the flows version changed on every flows creation.
+
+    Pollers skip the flows query while the version is not changed. `None`
+    (e.g. the cache is cleared) means the flows should be queried. The
+    per-process default cache (`LocMemCache`) misses the flows created by
+    the other processes, so the version is always `None` then.
+    """
+    if isinstance(caches["default"], (DummyCache, LocMemCache)):
+        return None
+
+    return await cache.aget(VERSION_CACHE_KEY)
+
+
+_buffer = ContextVar("flow_buffer", default=None)
+
+
+@contextmanager
+def buffered():
+    """Collect flows recorded inside the block and create them at exit."""
+    buffer = FlowBuffer()
+    token = _buffer.set(buffer)
+
+    try:
+        yield buffer
+    finally:
+        _buffer.reset(token)
+        buffer.flush()
+
+
+def record_many(sepulka_ids, message):
+    """Append the flow message to each of the given sepulki.
+
+    Messages are collected by the active `buffered` block (e.g. opened by
+    the `FlowBufferMiddleware` for the request) or created immediately
+    otherwise. Inside the transaction messages are appended on commit only,
+    so the rolled back changes are not recorded.
+    """
+    buffer = _buffer.get()
+    flush = buffer is None
+
+    if flush:
+        buffer = FlowBuffer()
+
+    sepulka_ids = list(sepulka_ids)
+
+    def append():
+        for sepulka_id in sepulka_ids:
+            buffer.append(sepulka_id, message)
+
+        if flush:
+            buffer.flush()
+
+    transaction.on_commit(append)
+
+
+def record(sepulka_id, message):
+    """Append the flow message to the given sepulka."""
+    return record_many([sepulka_id], message)
+
+
+def format_value(value):
+    if value is None:
+        return "-"
+
+    return str(value)
+
+
+def record_changes(instance, old_values):
+    """Record the changed fields of the sepulka related model instance.
+
+    Args:
+        instance: Saved `Process` or `Delivery` instance.
+        old_values: Map of the field name to its value before the save.
+    """
+    messages = []
+
+    for name, old_value in old_values.items():
+        new_value = getattr(instance, name)
+
+        if new_value == old_value:
+            continue
+
+        field = instance._meta.get_field(name)
+        if field.choices:
+            choices = dict(field.flatchoices)
+            old_value = choices.get(old_value, old_value)
+            new_value = choices.get(new_value, new_value)
+
+        messages.append(gettext("%(model)s %(field)s: %(old)s -> %(new)s.") % {
+            "model": instance._meta.verbose_name.capitalize(),
+            "field": field.verbose_name,
+            "old": format_value(old_value),
+            "new": format_value(new_value),
+        })
+
+    for message in messages:
+        record(instance.sepulka_id, message)
+
+
+class FlowBufferMiddleware:
+    """Collect flows recorded by the request and create them at the end.
+
+    So the flows recorded on the request hot paths cost the single INSERT
+    query per request instead of the one per flow.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        with buffered():
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        buffer = FlowBuffer()
+        token = _buffer.set(buffer)
+
+        try:
+            return await self.get_response(request)
+        finally:
+            _buffer.reset(token)
+
+            if buffer:
+                await sync_to_async(buffer.flush)()
@@ -0,0 +1,97 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from sepulka.models import (ArchivedDelivery, ArchivedFlow, ArchivedProcess,
+                            ArchivedSepulka, Delivery, Flow, Process,
+                            Sepulka, atomic_for_update)
+
+
+class Command(BaseCommand):
+    """Move long deleted sepulki to the archive tables.
+
+    Each batch of sepulki is moved with the related `Process`, `Delivery` and
+    `Flow` rows inside the single transaction, so the hot tables size is
+    bounded by the active sepulki rather than by the whole history.
+    """
+
+    help = "Move sepulki deleted more than the given days ago to the archive."
+
+    archived_models = (
+        (Process, ArchivedProcess),
+        (Delivery, ArchivedDelivery),
+        (Flow, ArchivedFlow),
+    )
+    """Pairs of the sepulka related models and their archive models."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days", type=int, default=30,
+            help="Archive sepulki deleted more than the given days ago.",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=1000,
+            help="Number of sepulki moved by the single transaction.",
+        )
+        parser.add_argument(
+            "--dry-run", action="store_true",
+            help="Print the number of sepulki to archive only.",
+        )
+
+    @staticmethod
+    def get_field_names(model):
+        return [
+            field.attname for field in model._meta.concrete_fields
+            if not field.primary_key or model is Sepulka
+        ]
+
+    def archive_batch(self, codes):
+        """Copy the given sepulki and the related rows and delete them."""
+        ArchivedSepulka.objects.bulk_create(
+            ArchivedSepulka(**values)
+            for values in Sepulka.objects.filter(pk__in=codes).values(
+                *self.get_field_names(Sepulka),
+            )
+        )
+
+        for model, archived_model in self.archived_models:
+            queryset = model.objects.filter(sepulka_id__in=codes)
+
+            archived_model.objects.bulk_create(
+                archived_model(**values)
+                for values in queryset.values(*self.get_field_names(model))
+            )
+            queryset.delete()
+
+        # The state counters are decremented by `SepulkaQuerySet.delete`.
+        Sepulka.objects.filter(pk__in=codes).delete()
+
+    def handle(self, *args, **options):
+        queryset = Sepulka.objects.filter(
+            state=Sepulka.StateChoice.DELETED,
+            date_updated__lt=timezone.now() - timedelta(days=options["days"]),
+        )
+
+        if options["dry_run"]:
+            self.stdout.write(f"{queryset.count()} sepulki to archive.")
+            return
+
+        total = 0
+
+        while True:
+            with atomic_for_update():
+                codes = list(
+                    queryset.order_by("date_updated")
+                    .values_list("pk", flat=True)[:options["batch_size"]]
+                )
+
+                if not codes:
+                    break
+
+                self.archive_batch(codes)
+
+            total += len(codes)
+            self.stdout.write(f"Archived {total} sepulki.")
+
+        self.stdout.write(self.style.SUCCESS(f"{total} sepulki archived."))
@@ -0,0 +1,467 @@
+import json
+import statistics
+import time
+import uuid
+from contextlib import ExitStack
+from itertools import cycle
+
+import django
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test.utils import CaptureQueriesContext, setup_test_environment
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from sepulka.management.commands.loadtest import percentile
+from sepulka.models import Sepulka
+from sepulka.views import SepulkaViewSet
+
+User = get_user_model()
+State = Sepulka.StateChoice
+
+
+class Command(BaseCommand):
+    """Benchmark every `SepulkaViewSet` and `UserViewSet` action.
+
+    Sends `--requests` requests of each action by the test client (with the
+    token authentication) and records the latency percentiles and the
+    number of the SQL queries to the JSON file. Compare the results of two
+    commits on the same seeded database (see the `seed` command)::
+
+        manage.py seed --sepulki 100000 --seed 1
+        manage.py benchmark --yes --output before.json
+        git checkout <commit>
+        manage.py benchmark --yes --output after.json --compare before.json
+
+    Write actions change the database (e.g. sepulki are created, deleted
+    and claimed), so the command runs against the configured database
+    confirmed by `--yes` only. Reseed it for the strictly comparable
+    results. The `sepulka.list` action requests the numbered pages, so it
+    is skipped (or fails if given explicitly) while the `PAGE_SIZE` setting
+    is not set.
+    """
+
+    help = "Benchmark the viewsets actions and save the JSON baseline."
+
+    batch_size = 100
+    """Number of sepulki changed by the single bulk request."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "actions", nargs="*", metavar="action",
+            help="Benchmarked actions (all actions by default).",
+        )
+        parser.add_argument(
+            "--requests", type=int, default=30,
+            help="Number of the timed requests of each action.",
+        )
+        parser.add_argument(
+            "--warmup", type=int, default=2,
+            help="Number of the not timed requests of each action.",
+        )
+        parser.add_argument(
+            "--output", default="benchmark.json",
+            help="Path of the JSON results file.",
+        )
+        parser.add_argument(
+            "--compare", metavar="BASELINE",
+            help="Path of the JSON results file to compare with.",
+        )
+        parser.add_argument(
+            "--yes", action="store_true",
+            help="Confirm the benchmark changes the configured database.",
+        )
+
+    def get_user(self, role, username, is_staff=False):
+        """Return the benchmark user with the 'password' password."""
+        user, created = User.objects.get_or_create(
+            username=username,
+            defaults={"role": role, "is_staff": is_staff},
+        )
+
+        if created:
+            user.set_password("password")
+            user.save()
+
+        return user
+
+    def get_client(self, user):
+        client = APIClient()
+        token, _ = Token.objects.get_or_create(user=user)
+        client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+        return client
+
+    def get_codes(self, state, number):
+        """Return the cycle of codes of the sepulki in the given state."""
+        codes = list(
+            Sepulka.objects.filter(state=state)
+            .values_list("pk", flat=True)[:number]
+        )
+
+        if not codes:
+            raise CommandError(
+                f"No {state.label} sepulki, seed the database first.",
+            )
+
+        return cycle(codes)
+
+    def get_batches(self, state, number):
+        codes = self.get_codes(state, number * self.batch_size)
+        return (
+            [str(next(codes)) for _ in range(self.batch_size)]
+            for _ in range(number)
+        )
+
+    def get_actions(self, requests):
+        """Return map of the action name to the `(client, requests)` pair.
+
+        Requests are the iterator of the `(method, path, data)` tuples.
+        Actions are built lazily, so the sepulki pools reflect the changes
+        made by the previous actions.
+        """
+        shmurdik = self.get_user(User.RoleChoice.SHMURDIK, "benchmark-shmurdik")
+        grymzik = self.get_user(User.RoleChoice.GRYMZIK, "benchmark-grymzik")
+        fufelnitsa = self.get_user(
+            User.RoleChoice.FUFELNITSA, "benchmark-fufelnitsa",
+        )
+        admin = self.get_user(
+            User.RoleChoice.SHMURDIK, "benchmark-admin", is_staff=True,
+        )
+        session = self.get_user(User.RoleChoice.FUFELNITSA, "benchmark-session")
+        total = requests + self.warmup
+
+        def repeat(*request):
+            return (request for _ in range(total))
+
+        def each(codes, method, path, data=None):
+            return (
+                (method, path.format(code=next(codes)), data)
+                for _ in range(total)
+            )
+
+        def batches(state, method, path, data):
+            return (
+                (method, path, {"codes": codes, **data})
+                for codes in self.get_batches(state, total)
+            )
+
+        def destroy_users():
+            for _ in range(total):
+                username = f"benchmark-deleted-{uuid.uuid4().hex[:12]}"
+                User.objects.create(username=username)
+                yield "DELETE", f"/users/{username}/", None
+
+        def logout():
+            # Restore the deleted token, so the client credentials are valid.
+            key = Token.objects.get(user=session).key
+
+            for _ in range(total):
+                Token.objects.get_or_create(user=session, key=key)
+                yield "POST", "/users/logout/", None
+
+        return {
+            "sepulka.list": lambda: (shmurdik, (
+                ("GET", f"/sepulki/?page={index % 10 + 1}", None)
+                for index in range(total)
+            )),
+            "sepulka.list_cursor": lambda: (shmurdik, repeat(
+                "GET", "/sepulki/?pagination=cursor", None,
+            )),
+            "sepulka.list_filtered": lambda: (shmurdik, repeat(
+                "GET", "/sepulki/?state=1&size=M&is_warm=true", None,
+            )),
+            "sepulka.list_name": lambda: (shmurdik, (
+                ("GET", f"/sepulki/?name=sepulka%20{index % 16:x}", None)
+                for index in range(total)
+            )),
+            "sepulka.retrieve": lambda: (shmurdik, each(
+                self.get_codes(State.COMPLETED, total), "GET", "/sepulki/{code}/",
+            )),
+            "sepulka.list_flow": lambda: (shmurdik, each(
+                self.get_codes(State.COMPLETED, total),
+                "GET", "/sepulki/{code}/list_flow/",
+            )),
+            "sepulka.create": lambda: (shmurdik, repeat(
+                "POST", "/sepulki/", {"name": "benchmark", "size": "L"},
+            )),
+            "sepulka.bulk_create": lambda: (shmurdik, repeat(
+                "POST", "/sepulki/bulk/",
+                [{"name": "benchmark"}] * self.batch_size,
+            )),
+            "sepulka.destroy": lambda: (shmurdik, each(
+                self.get_codes(State.CREATED, total),
+                "DELETE", "/sepulki/{code}/",
+            )),
+            "sepulka.export": lambda: (shmurdik, repeat(
+                "GET", "/sepulki/export/?state=1&size=XS&is_warm=true", None,
+            )),
+            "sepulka.cache_stats": lambda: (admin, repeat(
+                "GET", "/sepulki/cache-stats/", None,
+            )),
+            "sepulka.stats": lambda: (admin, repeat(
+                "GET", "/sepulki/stats/", None,
+            )),
+            "sepulka.changes": lambda: (shmurdik, repeat(
+                "GET", "/sepulki/changes/?limit=500", None,
+            )),
+            "sepulka.set_process_responsible": lambda: (shmurdik, each(
+                self.get_codes(State.CREATED, total),
+                "PUT", "/sepulki/{code}/process/responsible/",
+                {"responsible": grymzik.pk},
+            )),
+            "sepulka.update_process_properties": lambda: (grymzik, each(
+                self.get_codes(State.IN_PROCESS, total),
+                "PUT", "/sepulki/{code}/process/conveyor/",
+                {"is_vaccinated": True},
+            )),
+            "sepulka.update_delivery": lambda: (fufelnitsa, each(
+                self.get_codes(State.PROCESSED, total),
+                "PUT", "/sepulki/{code}/delivery/", {"method": "ROLL"},
+            )),
+            "sepulka.bulk_set_process_responsible": lambda: (shmurdik, batches(
+                State.CREATED, "PUT", "/sepulki/bulk/process/responsible/",
+                {"responsible": grymzik.pk},
+            )),
+            "sepulka.bulk_update_process_properties": lambda: (grymzik, batches(
+                State.IN_PROCESS, "PUT", "/sepulki/bulk/process/conveyor/",
+                {"is_vaccinated": True},
+            )),
+            "sepulka.bulk_update_delivery": lambda: (fufelnitsa, batches(
+                State.PROCESSED, "PUT", "/sepulki/bulk/delivery/",
+                {"method": "AIRB"},
+            )),
+            "sepulka.claim_process": lambda: (grymzik, repeat(
+                "POST", "/sepulki/claim/process/", {"count": 10},
+            )),
+            "sepulka.claim_delivery": lambda: (fufelnitsa, repeat(
+                "POST", "/sepulki/claim/delivery/", {"count": 10},
+            )),
+            "user.list": lambda: (shmurdik, repeat("GET", "/users/", None)),
+            "user.retrieve": lambda: (shmurdik, repeat(
+                "GET", f"/users/{grymzik.username}/", None,
+            )),
+            "user.update": lambda: (admin, repeat(
+                "PUT", f"/users/{session.username}/", {
+                    "username": session.username,
+                    "email": "session@example.com",
+                    "role": User.RoleChoice.FUFELNITSA,
+                },
+            )),
+            "user.partial_update": lambda: (admin, repeat(
+                "PATCH", f"/users/{session.username}/", {"email": ""},
+            )),
+            "user.destroy": lambda: (admin, destroy_users()),
+            "user.login": lambda: (session, repeat(
+                "POST", "/users/login/",
+                {"username": session.username, "password": "password"},
+            )),
+            "user.logout": lambda: (session, logout()),
+            "user.personal_retrieve": lambda: (fufelnitsa, repeat(
+                "GET", "/users/me/", None,
+            )),
+            "user.personal_partial_update": lambda: (fufelnitsa, repeat(
+                "PATCH", "/users/me/", {"email": "me@example.com"},
+            )),
+        }
+
+    def measure_connection(self, number=50):
+        """Return the mean milliseconds of `SELECT 1` over the new and the
+        reused database connection.
+
+        The test client keeps the connection between the requests, so the
+        connect cost (saved by `CONN_MAX_AGE`) is measured separately.
+        """
+        wrapper = type(connections["default"])(
+            {**connection.settings_dict}, alias="benchmark",
+        )
+
+        def query():
+            with wrapper.cursor() as cursor:
+                cursor.execute("SELECT 1")
+
+        timings = {"new": [], "reused": []}
+
+        try:
+            for _ in range(number):
+                start = time.perf_counter()
+                query()
+                timings["new"].append(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                query()
+                timings["reused"].append(time.perf_counter() - start)
+
+                wrapper.close()
+        finally:
+            wrapper.close()
+
+        return {
+            f"{name}_connection_ms": statistics.fmean(values) * 1000
+            for name, values in timings.items()
+        }
+
+    def send(self, client, method, path, data):
+        """Send the request and read the whole (streaming) response.
+
+        Returns:
+            Tuple of the response status, latency and number of queries.
+        """
+        with ExitStack() as stack:
+            contexts = [
+                stack.enter_context(CaptureQueriesContext(db))
+                for db in connections.all()
+            ]
+            start = time.perf_counter()
+
+            response = client.generic(
+                method, path,
+                json.dumps(data) if data is not None else "",
+                content_type="application/json",
+            )
+
+            if response.streaming:
+                b"".join(response.streaming_content)
+            else:
+                response.content
+
+            elapsed = time.perf_counter() - start
+
+        return (
+            response.status_code, elapsed,
+            sum(len(context) for context in contexts),
+        )
+
+    def run_action(self, user, requests):
+        client = self.get_client(user)
+        latencies = []
+        queries = []
+        errors = {}
+
+        for index, (method, path, data) in enumerate(requests):
+            status, elapsed, count = self.send(client, method, path, data)
+
+            if index < self.warmup:
+                continue
+
+            if status >= 400:
+                errors[status] = errors.get(status, 0) + 1
+
+            latencies.append(elapsed)
+            queries.append(count)
+
+        latencies.sort()
+
+        return {
+            "requests": len(latencies),
+            "errors": errors,
+            "mean_ms": statistics.fmean(latencies) * 1000,
+            **{
+                f"p{percent}_ms": percentile(latencies, percent) * 1000
+                for percent in (50, 90, 99)
+            },
+            "queries_mean": statistics.fmean(queries),
+            "queries_max": max(queries),
+        }
+
+    def compare(self, results, baseline):
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"{'action':<45} {'p50 ms':>21} {'queries':>17}",
+        ))
+
+        for name, stats in results["actions"].items():
+            base = baseline["actions"].get(name)
+
+            if base is None:
+                self.stdout.write(f"{name:<45} (new)")
+                continue
+
+            change = (
+                (stats["p50_ms"] - base["p50_ms"]) / base["p50_ms"] * 100
+                if base["p50_ms"] else 0
+            )
+            line = (
+                f"{name:<45} {base['p50_ms']:>7.2f} -> {stats['p50_ms']:>7.2f}"
+                f" {change:>+4.0f}% "
+                f"{base['queries_mean']:>6.1f} -> {stats['queries_mean']:>6.1f}"
+            )
+
+            if stats["queries_mean"] > base["queries_mean"] or change > 20:
+                line = self.style.WARNING(line)
+
+            self.stdout.write(line)
+
+    def handle(self, *args, **options):
+        if not options["yes"]:
+            raise CommandError(
+                f"The benchmark changes the '{connection.settings_dict['NAME']}'"
+                " database, pass --yes to confirm.",
+            )
+
+        setup_test_environment()
+        self.warmup = options["warmup"]
+
+        actions = self.get_actions(options["requests"])
+        names = options["actions"] or list(actions)
+
+        unknown = set(names) - actions.keys()
+        if unknown:
+            raise CommandError(f"Unknown actions: {', '.join(sorted(unknown))}.")
+
+        page_size = SepulkaViewSet.pagination_class.page_size
+
+        if page_size is None and "sepulka.list" in names:
+            # Unpaginated list ignores the `page` param and returns all rows.
+            if options["actions"]:
+                raise CommandError(
+                    "The sepulka list is not paginated, set the PAGE_SIZE "
+                    "setting to benchmark the 'sepulka.list' action.",
+                )
+
+            names.remove("sepulka.list")
+            self.stdout.write(self.style.WARNING(
+                "Skipped 'sepulka.list': the sepulka list is not paginated.",
+            ))
+
+        results = {
+            "meta": {
+                "date": timezone.now().isoformat(),
+                "django": django.get_version(),
+                "database": connection.vendor,
+                "sepulki": Sepulka.objects.count(),
+                "requests": options["requests"],
+                "page_size": page_size,
+                **self.measure_connection(),
+            },
+            "actions": {},
+        }
+
+        meta = results["meta"]
+        self.stdout.write(
+            f"database connection: new {meta['new_connection_ms']:.2f} ms, "
+            f"reused {meta['reused_connection_ms']:.2f} ms",
+        )
+
+        for name in names:
+            user, requests = actions[name]()
+            stats = self.run_action(user, requests)
+            results["actions"][name] = stats
+
+            errors = f", errors {stats['errors']}" if stats["errors"] else ""
+            self.stdout.write(
+                f"{name}: p50 {stats['p50_ms']:.2f} ms, "
+                f"p99 {stats['p99_ms']:.2f} ms, "
+                f"{stats['queries_mean']:.1f} queries{errors}",
+            )
+
+        with open(options["output"], "w") as file:
+            json.dump(results, file, indent=2)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Results saved to {options['output']}.",
+        ))
+
+        if options["compare"]:
+            with open(options["compare"]) as file:
+                self.compare(results, json.load(file))
@@ -0,0 +1,130 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connections
+
+from sepulka import claims
+from sepulka.management.commands.loadtest import percentile
+from sepulka.models import Delivery, Process, Sepulka
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    """Measure the claims throughput of the concurrent workers.
+
+    Creates `--sepulki` unassigned sepulki, then the `--workers` threads
+    claim them by `--count` (see `sepulka.claims.claim`) until nothing is
+    left to claim::
+
+        manage.py benchmark_claims --sepulki 5000 --workers 32 --count 10
+
+    Every worker uses its own database connection and one of the existing
+    grymzik (or fufelnitsa for `--model delivery`) users. Run it against
+    the development database only: the claimed sepulki are kept.
+    """
+
+    help = "Claim sepulki by the concurrent workers and print claims/sec."
+
+    models = {
+        "process": (Process, User.RoleChoice.GRYMZIK),
+        "delivery": (Delivery, User.RoleChoice.FUFELNITSA),
+    }
+
+    max_failures = 10
+    """Number of the failed claims (e.g. lock timeouts) stopping the worker."""
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--model", choices=list(self.models), default="process",
+        )
+        parser.add_argument(
+            "--sepulki", type=int, default=2000,
+            help="Number of the created unassigned sepulki.",
+        )
+        parser.add_argument(
+            "--workers", type=int, default=16,
+            help="Number of the concurrent worker threads.",
+        )
+        parser.add_argument(
+            "--count", type=int, default=1,
+            help="Number of sepulki claimed by the single claim.",
+        )
+
+    def create_sepulki(self, model, number):
+        creator = User.objects.filter(role=User.RoleChoice.SHMURDIK).first()
+
+        if creator is None:
+            raise CommandError("No shmurdik user to create sepulki.")
+
+        sepulki = Sepulka.objects.bulk_create_with_related([
+            Sepulka(name=f"claim benchmark {index}", creator=creator)
+            for index in range(number)
+        ])
+
+        if model is Delivery:
+            Process.objects.filter(
+                sepulka__in=sepulki,
+            ).update(is_processed=True)
+            Sepulka.objects.filter(pk__in=[s.pk for s in sepulki]).update(
+                state=Sepulka.StateChoice.PROCESSED,
+            )
+
+    def handle(self, *args, **options):
+        model, role = self.models[options["model"]]
+        users = list(User.objects.filter(role=role))
+
+        if not users:
+            raise CommandError(f"No {role.label} users to claim sepulki.")
+
+        self.create_sepulki(model, options["sepulki"])
+
+        claimed = []
+        errors = []
+        latencies = []
+        lock = threading.Lock()
+
+        def work(index):
+            user = users[index % len(users)]
+            failures = 0
+
+            try:
+                while failures < self.max_failures:
+                    start = time.perf_counter()
+
+                    try:
+                        codes = claims.claim(model, user, options["count"])
+                    except DatabaseError as error:
+                        failures += 1
+                        with lock:
+                            errors.append(error)
+                        continue
+
+                    with lock:
+                        latencies.append(time.perf_counter() - start)
+                        claimed.extend(codes)
+
+                    if not codes:
+                        return
+            finally:
+                connections.close_all()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["workers"]) as executor:
+            list(executor.map(work, range(options["workers"])))
+        elapsed = time.perf_counter() - start
+
+        latencies.sort()
+        self.stdout.write(f"claimed: {len(claimed)}")
+        self.stdout.write(f"duplicates: {len(claimed) - len(set(claimed))}")
+        self.stdout.write(f"errors: {len(errors)}")
+        self.stdout.write(f"claims/sec: {len(claimed) / elapsed:.1f}")
+
+        for percent in (50, 99):
+            value = percentile(latencies, percent)
+
+            if value is not None:
+                self.stdout.write(f"p{percent}: {value * 1000:.2f} ms")
@@ -0,0 +1,84 @@
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+from rest_framework.request import Request
+
+from sepulka.models import Flow
+from sepulka.pagination import FlowCursorPagination
+from sepulka.views import SepulkaViewSet
+
+
+class Command(BaseCommand):
+    """Print the `EXPLAIN` plans of the `SepulkaViewSet` queries.
+
+    Builds the querysets the same way the viewset does for each action, so
+    the plans can be compared between commits to detect missed indexes.
+    """
+
+    help = "Print the EXPLAIN plans of the sepulka viewset queries."
+
+    actions = (
+        "list", "retrieve", "destroy", "list_flow",
+        "set_process_responsible", "update_process_properties",
+        "update_delivery",
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "actions", nargs="*", metavar="action",
+            help="Viewset actions to explain (all actions by default).",
+        )
+        parser.add_argument(
+            "--query", default="",
+            help="Query string of the list request, e.g. 'pagination=cursor'.",
+        )
+        parser.add_argument(
+            "--analyze", action="store_true",
+            help="Execute the queries (backends with `EXPLAIN ANALYZE` only).",
+        )
+
+    def get_queryset(self, action, request):
+        view = SepulkaViewSet(
+            action=action, request=request, format_kwarg=None, kwargs={},
+        )
+        # Any code is suitable, the plan does not depend on the value.
+        code = uuid.uuid4()
+
+        if action == "list":
+            queryset = view.filter_queryset(view.get_queryset())
+
+            paginator = view.paginator
+            ordering = getattr(paginator, "ordering", None)
+            if ordering:
+                queryset = queryset.order_by(*ordering)
+
+            return queryset[:getattr(paginator, "page_size", None) or 100]
+
+        if action == "list_flow":
+            return Flow.objects.filter(sepulka_id=code).order_by(
+                *FlowCursorPagination.ordering,
+            )
+
+        return view.get_queryset().filter(pk=code)
+
+    def handle(self, *args, **options):
+        actions = options["actions"] or self.actions
+
+        for action in actions:
+            if action not in self.actions:
+                raise CommandError(f"Unknown action '{action}'.")
+
+        request = Request(RequestFactory().get(
+            "/sepulki/", QUERY_STRING=options["query"],
+        ))
+
+        explain_options = {"analyze": True} if options["analyze"] else {}
+
+        for action in actions:
+            queryset = self.get_queryset(action, request)
+
+            self.stdout.write(self.style.MIGRATE_HEADING(f"{action}:"))
+            self.stdout.write(str(queryset.query))
+            self.stdout.write(queryset.explain(**explain_options))
+            self.stdout.write("")
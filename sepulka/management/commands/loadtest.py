@@ -0,0 +1,117 @@
+import http.client
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+def percentile(values, percent):
+    """Return the nearest-rank percentile of the sorted values."""
+    if not values:
+        return None
+
+    index = max(0, min(len(values) - 1, round(percent / 100 * len(values)) - 1))
+    return values[index]
+
+
+class Command(BaseCommand):
+    """Load the running server endpoints with the concurrent requests.
+
+    Compares throughput and latency of the same endpoints served by the
+    different entry points, e.g. the sync and the async sepulka endpoints
+    served by `uvicorn config.asgi:application` and the sync ones served
+    by the WSGI server::
+
+        manage.py loadtest --token <key> \\
+            http://127.0.0.1:8000/sepulki/ \\
+            http://127.0.0.1:8000/async/sepulki/
+
+    Each worker thread uses the single keep-alive connection.
+    """
+
+    help = "Send concurrent GET requests to the given URLs and print stats."
+
+    def add_arguments(self, parser):
+        parser.add_argument("urls", nargs="+", metavar="url")
+        parser.add_argument(
+            "--requests", type=int, default=1000,
+            help="Number of requests sent to each URL.",
+        )
+        parser.add_argument(
+            "--concurrency", type=int, default=16,
+            help="Number of concurrent connections.",
+        )
+        parser.add_argument("--token", help="Authentication token key.")
+
+    def load(self, url, requests, concurrency, headers):
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https"):
+            raise CommandError(f"Unsupported URL '{url}'.")
+
+        connection_class = (
+            http.client.HTTPSConnection if parts.scheme == "https"
+            else http.client.HTTPConnection
+        )
+        path = parts.path + (f"?{parts.query}" if parts.query else "")
+
+        local = threading.local()
+        latencies = []
+        errors = []
+
+        def send(_):
+            if not hasattr(local, "connection"):
+                local.connection = connection_class(parts.netloc, timeout=30)
+
+            start = time.perf_counter()
+            try:
+                local.connection.request("GET", path, headers=headers)
+                response = local.connection.getresponse()
+                response.read()
+            except (OSError, http.client.HTTPException) as error:
+                local.connection.close()
+                del local.connection
+                errors.append(error)
+                return
+
+            latencies.append(time.perf_counter() - start)
+            if response.status >= 400:
+                errors.append(response.status)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(send, range(requests)))
+        elapsed = time.perf_counter() - start
+
+        latencies.sort()
+        return {
+            "requests": requests,
+            "errors": len(errors),
+            "rps": requests / elapsed,
+            "mean": statistics.fmean(latencies) if latencies else None,
+            "p50": percentile(latencies, 50),
+            "p99": percentile(latencies, 99),
+        }
+
+    def handle(self, *args, **options):
+        headers = {"Connection": "keep-alive"}
+        if options["token"]:
+            headers["Authorization"] = f"Token {options['token']}"
+
+        for url in options["urls"]:
+            stats = self.load(
+                url, options["requests"], options["concurrency"], headers,
+            )
+
+            self.stdout.write(self.style.MIGRATE_HEADING(url))
+
+            for name in ("requests", "errors"):
+                self.stdout.write(f"  {name}: {stats[name]}")
+
+            self.stdout.write(f"  requests/sec: {stats['rps']:.1f}")
+
+            for name in ("mean", "p50", "p99"):
+                if stats[name] is not None:
+                    self.stdout.write(f"  {name}: {stats[name] * 1000:.2f} ms")
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from sepulka import counters
+
+
+class Command(BaseCommand):
+    """Rebuild the sepulki statistics counters from scratch.
+
+    Computes the counters by the full tables scan, replaces the stored ones
+    and reports the mismatched counters, which means some rows were changed
+    bypassing the counters deltas (e.g. by the raw SQL or the admin).
+    """
+
+    help = "Rebuild the sepulki counters and verify the stored values."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check", action="store_true",
+            help="Exit with the error on mismatches instead of rebuilding.",
+        )
+
+    def handle(self, *args, **options):
+        if options["check"]:
+            mismatches = counters.get_mismatches(
+                counters.get_values(), counters.count(),
+            )
+        else:
+            mismatches = counters.rebuild()
+
+        for key, (stored, computed) in sorted(mismatches.items()):
+            self.stdout.write(f"{key}: stored {stored}, computed {computed}")
+
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS("Counters match."))
+        elif options["check"]:
+            raise CommandError(f"{len(mismatches)} counters mismatch.")
+        else:
+            self.stdout.write(self.style.WARNING(
+                f"{len(mismatches)} counters rebuilt.",
+            ))
@@ -0,0 +1,248 @@
+import random
+import time
+import uuid
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.translation import gettext
+
+from sepulka import counters
+from sepulka.models import Delivery, Flow, Process, Sepulka
+
+User = get_user_model()
+State = Sepulka.StateChoice
+
+LIFECYCLE = (
+    State.CREATED, State.IN_PROCESS, State.PROCESSED,
+    State.IN_DELIVERY, State.COMPLETED,
+)
+"""Sepulka states in the order of the sepulka lifecycle."""
+
+STATE_WEIGHTS = {
+    State.CREATED: 20,
+    State.IN_PROCESS: 15,
+    State.PROCESSED: 15,
+    State.IN_DELIVERY: 10,
+    State.COMPLETED: 35,
+    State.DELETED: 5,
+}
+"""Relative number of the seeded sepulki of each state."""
+
+
+class Command(BaseCommand):
+    """Fill the database with the synthetic users and sepulki.
+
+    Creates `--users` users of each role and `--sepulki` sepulki with the
+    `Process`, `Delivery` and `Flow` rows matching their state, e.g. the
+    processed sepulka has the responsible grymzik, the processed process
+    and the flow of each passed state transition. All rows are created by
+    `bulk_create` in batches of `--batch-size` sepulki, each batch inside
+    the single transaction. Sepulki creation dates are spread over the last
+    `--days` days, the flows, process and delivery dates follow the sepulka
+    ones. The same `--seed` produces the same data::
+
+        manage.py seed --sepulki 1000000 --seed 1
+
+    Counters (see `sepulka.counters`) are rebuilt once at the end.
+    """
+
+    help = "Create synthetic users and sepulki by the bulk inserts."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--users", type=int, default=20,
+            help="Number of the created users of each role.",
+        )
+        parser.add_argument(
+            "--sepulki", type=int, default=100000,
+            help="Number of the created sepulki.",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=5000,
+            help="Number of sepulki created by the single transaction.",
+        )
+        parser.add_argument(
+            "--days", type=int, default=365,
+            help="Number of days the sepulki creation dates are spread over.",
+        )
+        parser.add_argument(
+            "--seed", type=int, default=None,
+            help="Random seed of the generated data.",
+        )
+
+    def create_users(self, number):
+        """Create `number` users of each role (existing ones are kept).
+
+        Returns:
+            Map of the role to the list of its users ids.
+        """
+        password = make_password("password")
+
+        User.objects.bulk_create(
+            [
+                User(
+                    username=f"seed-{role.name.lower()}-{index}",
+                    role=role, password=password,
+                )
+                for role in User.RoleChoice
+                for index in range(number)
+            ],
+            ignore_conflicts=True,
+        )
+
+        return {
+            role: list(
+                User.objects.filter(role=role).values_list("pk", flat=True),
+            )
+            for role in User.RoleChoice
+        }
+
+    def build_sepulka(self, rng, users):
+        """Return the sepulka with the related rows and flows.
+
+        Returns:
+            Tuple of the sepulka, process, delivery and the list of flows.
+        """
+        state = rng.choices(
+            list(STATE_WEIGHTS), weights=list(STATE_WEIGHTS.values()),
+        )[0]
+        # Deleted sepulki are deleted at the random lifecycle stage.
+        stage = (
+            rng.randrange(len(LIFECYCLE)) if state == State.DELETED
+            else LIFECYCLE.index(state)
+        )
+
+        sepulka = Sepulka(
+            code=uuid.UUID(int=rng.getrandbits(128), version=4),
+            name=f"sepulka {rng.getrandbits(32):08x}",
+            creator_id=rng.choice(users[User.RoleChoice.SHMURDIK]),
+            state=state,
+            size=rng.choice(Sepulka.SizeChoice.values),
+            is_warm=rng.random() < 0.5,
+            is_square=rng.random() < 0.5,
+            is_soft=rng.random() < 0.5,
+        )
+        process = Process(sepulka=sepulka)
+        delivery = Delivery(sepulka=sepulka)
+
+        if stage >= LIFECYCLE.index(State.IN_PROCESS):
+            process.responsible_id = rng.choice(users[User.RoleChoice.GRYMZIK])
+
+        if stage >= LIFECYCLE.index(State.PROCESSED):
+            process.is_processed = True
+            process.is_vaccinated = rng.random() < 0.7
+
+        if stage >= LIFECYCLE.index(State.IN_DELIVERY):
+            delivery.responsible_id = rng.choice(
+                users[User.RoleChoice.FUFELNITSA],
+            )
+
+        if stage >= LIFECYCLE.index(State.COMPLETED):
+            delivery.method = rng.choice(Delivery.MethodChoice.values)
+
+        messages = self.lifecycle_messages[:stage + 1]
+
+        if state == State.DELETED:
+            messages = [*messages, self.deleted_message]
+
+        flows = [Flow(sepulka=sepulka, message=message) for message in messages]
+
+        return sepulka, process, delivery, flows
+
+    def spread_dates(self, rng, rows, days):
+        """Set the random creation date of the last `days` days and the
+        later update date to each of the given sepulki.
+
+        Flows are spread evenly between the sepulka dates, the process and
+        delivery are updated by the flow of their last lifecycle stage.
+        """
+        now = timezone.now()
+
+        for sepulka, process, delivery, flows in rows:
+            age = timedelta(seconds=rng.uniform(0, days * 24 * 60 * 60))
+            sepulka.date_created = now - age
+            sepulka.date_updated = now - age * rng.random()
+
+            duration = sepulka.date_updated - sepulka.date_created
+            for index, flow in enumerate(flows):
+                flow.date_created = sepulka.date_created + (
+                    duration * index / max(len(flows) - 1, 1)
+                )
+
+            # The deleted sepulka has the deletion flow after its stage one.
+            stage = len(flows) - 1 - (sepulka.state == State.DELETED)
+            process.date_updated = flows[
+                min(stage, LIFECYCLE.index(State.PROCESSED))
+            ].date_created
+            delivery.date_updated = flows[
+                stage if stage >= LIFECYCLE.index(State.IN_DELIVERY) else 0
+            ].date_created
+
+    def create_batch(self, rng, users, number, days):
+        rows = [self.build_sepulka(rng, users) for _ in range(number)]
+        sepulki = [row[0] for row in rows]
+        processes = [row[1] for row in rows]
+        deliveries = [row[2] for row in rows]
+        flows = [flow for row in rows for flow in row[3]]
+
+        with transaction.atomic():
+            Sepulka.objects.bulk_create(sepulki)
+            Process.objects.bulk_create(processes)
+            Delivery.objects.bulk_create(deliveries)
+            Flow.objects.bulk_create(flows, batch_size=number)
+
+            # The inserts set the same `auto_now` and `auto_now_add` dates
+            # to all rows, the spread dates are saved by the updates.
+            self.spread_dates(rng, rows, days)
+            Sepulka.objects.bulk_update(
+                sepulki, ["date_created", "date_updated"],
+            )
+            Process.objects.bulk_update(processes, ["date_updated"])
+            Delivery.objects.bulk_update(deliveries, ["date_updated"])
+            Flow.objects.bulk_update(flows, ["date_created"])
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        start = time.perf_counter()
+
+        # Flow messages of each lifecycle stage, translated once.
+        self.lifecycle_messages = [
+            gettext("Sepulka created."),
+            *(
+                gettext("Sepulka state: %(expected)s -> %(target)s.") % {
+                    "expected": expected.label, "target": target.label,
+                }
+                for expected, target in zip(LIFECYCLE, LIFECYCLE[1:])
+            ),
+        ]
+        self.deleted_message = gettext("Sepulka deleted.")
+
+        users = self.create_users(options["users"])
+
+        for role, ids in users.items():
+            if not ids:
+                raise CommandError(f"No {role.label} users to seed sepulki.")
+
+            self.stdout.write(f"{len(ids)} {role.label} users.")
+
+        created = 0
+
+        while created < options["sepulki"]:
+            number = min(options["batch_size"], options["sepulki"] - created)
+            self.create_batch(rng, users, number, options["days"])
+            created += number
+
+            self.stdout.write(
+                f"Created {created} sepulki "
+                f"({time.perf_counter() - start:.1f} s).",
+            )
+
+        counters.rebuild()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{created} sepulki created in {time.perf_counter() - start:.1f} s.",
+        ))
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:03
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sepulka', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='flow',
+            index=models.Index(fields=['sepulka', '-date_created', '-id'], name='flow_sepulka_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sepulka',
+            index=models.Index(fields=['-date_created', '-code'], name='sepulka_date_created_code_idx'),
+        ),
+    ]
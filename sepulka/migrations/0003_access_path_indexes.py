@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:04
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sepulka', '0002_cursor_pagination_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='delivery',
+            index=models.Index(fields=['responsible', 'method'], name='delivery_resp_method_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='delivery',
+            index=models.Index(fields=['method'], name='delivery_method_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='process',
+            index=models.Index(fields=['responsible', 'is_processed'], name='process_resp_state_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='process',
+            index=models.Index(fields=['is_processed', 'is_vaccinated'], name='process_state_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sepulka',
+            index=models.Index(fields=['state', '-date_created'], name='sepulka_state_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sepulka',
+            index=models.Index(fields=['creator', 'state'], name='sepulka_creator_state_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sepulka',
+            index=models.Index(condition=models.Q(('state', 0), _negated=True), fields=['-date_created'], name='sepulka_live_date_idx'),
+        ),
+    ]
@@ -0,0 +1,106 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sepulka', '0003_access_path_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedDelivery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('method', models.CharField(choices=[('SDEL', 'self delivery'), ('ROLL', 'roll'), ('AIRB', 'air balloon')], max_length=4, null=True, verbose_name='type')),
+                ('date_updated', models.DateTimeField(verbose_name='date updated')),
+            ],
+            options={
+                'verbose_name': 'archived sepulka delivery',
+                'verbose_name_plural': 'archived sepulka deliveries',
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedFlow',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('message', models.CharField(max_length=256, verbose_name='message')),
+                ('date_created', models.DateTimeField(verbose_name='date created')),
+            ],
+            options={
+                'verbose_name': 'archived sepulka flow',
+                'verbose_name_plural': 'archived sepulka flows',
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedProcess',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('is_vaccinated', models.BooleanField(verbose_name='is vaccinated')),
+                ('is_processed', models.BooleanField(verbose_name='is processed')),
+                ('date_updated', models.DateTimeField(verbose_name='date updated')),
+            ],
+            options={
+                'verbose_name': 'archived sepulka process',
+                'verbose_name_plural': 'archived sepulka processes',
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedSepulka',
+            fields=[
+                ('code', models.UUIDField(editable=False, primary_key=True, serialize=False, verbose_name='code')),
+                ('name', models.CharField(max_length=128, verbose_name='name')),
+                ('is_warm', models.BooleanField(verbose_name='is warm')),
+                ('is_square', models.BooleanField(verbose_name='is square')),
+                ('is_soft', models.BooleanField(verbose_name='is soft')),
+                ('size', models.CharField(choices=[('XS', 'Xs'), ('S', 'S'), ('M', 'M'), ('L', 'L'), ('XL', 'Xl'), ('XXL', 'Xxl')], max_length=3, verbose_name='size')),
+                ('state', models.PositiveSmallIntegerField(choices=[(0, 'deleted'), (1, 'created'), (2, 'in process'), (3, 'processed'), (4, 'in delivery'), (5, 'completed')], verbose_name='state')),
+                ('date_created', models.DateTimeField(verbose_name='date created')),
+                ('date_updated', models.DateTimeField(verbose_name='date updated')),
+                ('date_archived', models.DateTimeField(auto_now_add=True, verbose_name='date archived')),
+            ],
+            options={
+                'verbose_name': 'archived sepulka',
+                'verbose_name_plural': 'archived sepulki',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='sepulka',
+            index=models.Index(condition=models.Q(('state', 0)), fields=['date_updated'], name='sepulka_deleted_date_idx'),
+        ),
+        migrations.AddField(
+            model_name='archiveddelivery',
+            name='responsible',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='responsible user'),
+        ),
+        migrations.AddField(
+            model_name='archivedprocess',
+            name='responsible',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='responsible user'),
+        ),
+        migrations.AddField(
+            model_name='archivedsepulka',
+            name='creator',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='user creator'),
+        ),
+        migrations.AddField(
+            model_name='archivedprocess',
+            name='sepulka',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='process', to='sepulka.archivedsepulka', verbose_name='sepulka'),
+        ),
+        migrations.AddField(
+            model_name='archivedflow',
+            name='sepulka',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='flows', to='sepulka.archivedsepulka', verbose_name='sepulka'),
+        ),
+        migrations.AddField(
+            model_name='archiveddelivery',
+            name='sepulka',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='delivery', to='sepulka.archivedsepulka', verbose_name='sepulka'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sepulka', '0004_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SepulkaCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, verbose_name='key')),
+                ('shard', models.PositiveSmallIntegerField(verbose_name='shard')),
+                ('value', models.BigIntegerField(default=0, verbose_name='value')),
+            ],
+            options={
+                'verbose_name': 'sepulka counter',
+                'verbose_name_plural': 'sepulka counters',
+                'constraints': [models.UniqueConstraint(fields=('key', 'shard'), name='sepulka_counter_key_shard')],
+            },
+        ),
+    ]
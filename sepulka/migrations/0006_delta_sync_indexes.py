@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:08
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sepulka', '0005_counters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='delivery',
+            index=models.Index(fields=['date_updated', 'id'], name='delivery_updated_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='process',
+            index=models.Index(fields=['date_updated', 'id'], name='process_updated_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sepulka',
+            index=models.Index(fields=['date_updated', 'code'], name='sepulka_updated_code_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:09
+
+import django.db.models.deletion
+import sepulka.validators
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sepulka', '0006_delta_sync_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='sepulka',
+            name='sepulka_creator_state_idx',
+        ),
+        migrations.AlterField(
+            model_name='sepulka',
+            name='creator',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, to=settings.AUTH_USER_MODEL, validators=[sepulka.validators.validate_user_shmurdik], verbose_name='user creator'),
+        ),
+        migrations.AddIndex(
+            model_name='sepulka',
+            index=models.Index(fields=['creator', 'state', '-date_created'], name='sepulka_creator_state_idx'),
+        ),
+    ]
@@ -1,14 +1,274 @@
 import uuid
+from contextlib import contextmanager
 
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import connections, models, router, transaction
+from django.utils.translation import gettext
 from django.utils.translation import gettext_lazy as _
 
+from sepulka import counters, flow
 from sepulka.validators import (validate_user_fufelnitsa,
                                 validate_user_grymzik, validate_user_shmurdik)
 
 
-class Sepulka(models.Model):
+def select_for_update_of_self(queryset, **kwargs):
+    """Return the queryset locking the rows of its model only.
+
+    Passes `of=("self",)` to the `select_for_update` (PostgreSQL can not lock
+    the nullable side of the outer join) if the backend supports it (e.g.
+    MariaDB does not).
+    """
+    connection = connections[router.db_for_write(queryset.model)]
+
+    if connection.features.has_select_for_update_of:
+        kwargs["of"] = ("self",)
+
+    return queryset.select_for_update(**kwargs)
+
+
+@contextmanager
+def atomic_for_update(using=None, savepoint=True):
+    """Return the `transaction.atomic` block reading the rows it changes.
+
+    SQLite (see `config.backends.sqlite3`) does not lock the selected rows,
+    so the outermost block takes the database write lock when it begins
+    instead. Other backends lock the rows selected by the
+    `select_for_update_of_self` querysets of the block.
+    """
+    connection = transaction.get_connection(using)
+    immediate = (
+        hasattr(connection, "begin_immediate")
+        and not connection.in_atomic_block
+    )
+
+    if not immediate:
+        with transaction.atomic(using=using, savepoint=savepoint):
+            yield
+        return
+
+    connection.begin_immediate = True
+
+    try:
+        with transaction.atomic(using=using, savepoint=savepoint):
+            # The transaction has begun, the nested ones are not affected.
+            connection.begin_immediate = False
+            yield
+    finally:
+        connection.begin_immediate = False
+
+
+class DirtyFieldsMixin:
+    """Save the changed fields of the model instance only.
+
+    Remembers the field values loaded from the database (or saved last) and
+    passes the changed fields (with `auto_now` fields) as `update_fields`
+    argument of the `save` method. Skips the save if no field is changed,
+    so the `auto_now` fields are touched by the explicit
+    `save(update_fields=[...])` only.
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_saved_values()
+        return instance
+
+    def remember_saved_values(self, fields=None):
+        """Remember the current values of the given field names (or
+        attnames) as the saved ones, of all loaded fields if `fields` is
+        `None`."""
+        if fields is None:
+            deferred = self.get_deferred_fields()
+            self._saved_values = {}
+            attnames = [
+                field.attname for field in self._meta.concrete_fields
+                if field.attname not in deferred
+            ]
+        else:
+            attnames = [self._meta.get_field(name).attname for name in fields]
+
+        self._saved_values.update(
+            (attname, getattr(self, attname)) for attname in attnames
+        )
+
+    def get_dirty_fields(self):
+        """Return names of the fields changed since the last load or save."""
+        saved_values = getattr(self, "_saved_values", {})
+
+        return [
+            field.name for field in self._meta.concrete_fields
+            if field.attname in saved_values
+            and getattr(self, field.attname) != saved_values[field.attname]
+        ]
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        # Deferred fields are loaded by the `refresh_from_db(fields=[...])`
+        # call too, the not refreshed fields keep their unsaved changes.
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+
+        if fields is None or not hasattr(self, "_saved_values"):
+            self.remember_saved_values()
+        else:
+            self.remember_saved_values(fields)
+
+    def save(self, *args, **kwargs):
+        if (
+            not args and not self._state.adding
+            and kwargs.get("update_fields") is None
+            and not kwargs.get("force_insert")
+            and hasattr(self, "_saved_values")
+        ):
+            dirty_fields = self.get_dirty_fields()
+
+            if not dirty_fields:
+                return
+
+            kwargs["update_fields"] = [
+                *dirty_fields,
+                *(
+                    field.name for field in self._meta.concrete_fields
+                    if getattr(field, "auto_now", False)
+                    and field.name not in dirty_fields
+                ),
+            ]
+
+        super().save(*args, **kwargs)
+
+        if kwargs.get("update_fields") is None or not hasattr(
+            self, "_saved_values",
+        ):
+            self.remember_saved_values()
+        else:
+            self.remember_saved_values(kwargs["update_fields"])
+
+
+class CountedChangesMixin:
+    """Add the `sepulka.counters` deltas of the saved `counted_fields`
+    changes inside the saving transaction.
+
+    Requires the `DirtyFieldsMixin` to find the changed fields. Used by the
+    sepulka related models, `Sepulka` overrides the `get_counted_deltas`.
+    """
+
+    counted_fields = ()
+
+    def get_counted_deltas(self, fields):
+        """Return the counter deltas of the given changed `counted_fields`.
+
+        Called inside the saving transaction before the row is updated. The
+        saved values are read from the locked row (not from the instance
+        loaded earlier), so the change made by the concurrent writer is not
+        counted twice. Rows of the deleted sepulki are not counted (see
+        `counters.count`).
+        """
+        saved_values = (
+            select_for_update_of_self(
+                type(self)._base_manager.filter(pk=self.pk),
+            )
+            .values(*fields, "sepulka__state")
+            .first()
+        )
+
+        if (
+            saved_values is None
+            or saved_values["sepulka__state"] == Sepulka.StateChoice.DELETED
+        ):
+            return {}
+
+        return counters.get_change_deltas(type(self), [(
+            saved_values, {name: getattr(self, name) for name in fields},
+        )])
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        counted = [] if self._state.adding else [
+            name for name in self.get_dirty_fields()
+            if name in self.counted_fields
+            and (update_fields is None or name in update_fields)
+        ]
+
+        if not counted:
+            return super().save(*args, **kwargs)
+
+        # Joins the outer transaction (e.g. of `safe_delete`) without the
+        # savepoint, as `Model.save_base` does.
+        with atomic_for_update(savepoint=False):
+            deltas = self.get_counted_deltas(counted)
+            super().save(*args, **kwargs)
+            counters.add(deltas)
+
+
+class SepulkaQuerySet(models.QuerySet):
+    def get_counted_values(self):
+        """Lock the sepulki and return the list of their `COUNTED_VALUES`
+        maps (see `sepulka.counters`).
+
+        Must be called inside the transaction.
+        """
+        return list(
+            select_for_update_of_self(self).values(*counters.COUNTED_VALUES),
+        )
+
+    def delete(self):
+        # Hard deleted sepulki are removed from the counters.
+        with atomic_for_update(using=self.db):
+            deltas = counters.get_removed_deltas(self.get_counted_values())
+            deleted = super().delete()
+            counters.add(deltas)
+
+        return deleted
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+    def bulk_create_with_related(self, objs, batch_size=None):
+        """Create the given sepulki with their `Process` and `Delivery` rows.
+
+        Unlike `Sepulka.save`, uses `bulk_create` for every model, so the
+        number of INSERT queries does not depend on the number of objects.
+        All rows are created inside the single transaction.
+
+        Returns:
+            List of the created sepulki.
+        """
+        with transaction.atomic(using=self.db):
+            sepulki = self.bulk_create(objs, batch_size=batch_size)
+
+            # `bulk_create` does not call `save`, so the saved values (used
+            # to find and count the changes) are remembered here.
+            for sepulka in sepulki:
+                sepulka.remember_saved_values()
+
+            for model in [Process, Delivery]:
+                model.objects.using(self.db).bulk_create(
+                    [model(sepulka=sepulka) for sepulka in sepulki],
+                    batch_size=batch_size,
+                )
+
+            counters.add(counters.get_created_deltas(sepulki))
+
+            flow.record_many(
+                [sepulka.pk for sepulka in sepulki],
+                gettext("Sepulka created."),
+            )
+
+        return sepulki
+
+
+class LiveSepulkaManager(models.Manager.from_queryset(SepulkaQuerySet)):
+    """Manager of the not deleted sepulki.
+
+    Excludes rows with `Sepulka.StateChoice.DELETED` state, so the queries
+    are covered by the partial indexes of the live rows.
+    """
+
+    def get_queryset(self):
+        return super().get_queryset().exclude(
+            state=Sepulka.StateChoice.DELETED,
+        )
+
+
+class Sepulka(CountedChangesMixin, DirtyFieldsMixin, models.Model):
     code = models.UUIDField(
         verbose_name=_("code"),
         default=uuid.uuid4,
@@ -47,35 +307,113 @@ class Sepulka(models.Model):
         _("state"), choices=StateChoice.choices, default=StateChoice.CREATED,
     )
 
+    # Indexed by the `sepulka_creator_state_idx` (the creator column first).
     creator = models.ForeignKey(
         get_user_model(), on_delete=models.PROTECT,
-        verbose_name=_("user creator"),
+        verbose_name=_("user creator"), db_index=False,
         validators=[validate_user_shmurdik,],
     )
 
     date_created = models.DateTimeField(_("date created"), auto_now_add=True)
     date_updated = models.DateTimeField(_("date updated"), auto_now=True)
 
+    objects = SepulkaQuerySet.as_manager()
+    live = LiveSepulkaManager()
+
+    counted_fields = ("state", "size")
+
     def save(self, *args, **kwargs) -> None:
-        super().save(*args, **kwargs)
+        if not self._state.adding:
+            return super().save(*args, **kwargs)
 
-        for model in [Process, Delivery]:
-            if hasattr(self, model._meta.model_name):
-                continue
+        with transaction.atomic():
+            super().save(*args, **kwargs)
 
-            model.objects.create(sepulka=self)
+            # Related rows can be missing for the just inserted sepulka only.
+            for model in [Process, Delivery]:
+                model.objects.create(sepulka=self)
+
+            counters.add(counters.get_created_deltas([self]))
+
+        flow.record(self.pk, gettext("Sepulka created."))
 
     class Meta:
         verbose_name = _("sepulka")
         verbose_name_plural = _("sepulki")
         ordering = ["-date_created",]
+        indexes = [
+            models.Index(
+                fields=["-date_created", "-code"],
+                name="sepulka_date_created_code_idx",
+            ),
+            models.Index(
+                fields=["state", "-date_created"],
+                name="sepulka_state_date_idx",
+            ),
+            # Also orders the sepulki of the creator in the given state.
+            models.Index(
+                fields=["creator", "state", "-date_created"],
+                name="sepulka_creator_state_idx",
+            ),
+            # Partial index of the not deleted (`StateChoice.DELETED`) rows.
+            models.Index(
+                fields=["-date_created"],
+                condition=~models.Q(state=0),
+                name="sepulka_live_date_idx",
+            ),
+            # Delta sync keyset index (see `sepulka.changes`).
+            models.Index(
+                fields=["date_updated", "code"],
+                name="sepulka_updated_code_idx",
+            ),
+            # Partial index of the deleted rows used by the archiving.
+            models.Index(
+                fields=["date_updated"],
+                condition=models.Q(state=0),
+                name="sepulka_deleted_date_idx",
+            ),
+        ]
+
+    def get_counted_deltas(self, fields):
+        # The saved values are read from the locked row, the deleted and
+        # restored sepulki also move their process and delivery counters.
+        rows = Sepulka.objects.filter(pk=self.pk).get_counted_values()
+
+        if not rows:
+            return {}
+
+        return counters.get_sepulka_change_deltas(rows[0], {
+            **rows[0], **{name: getattr(self, name) for name in fields},
+        })
+
+    def delete(self, using=None, keep_parents=False):
+        with atomic_for_update(using=using):
+            rows = Sepulka.objects.filter(pk=self.pk).get_counted_values()
+            deleted = super().delete(using=using, keep_parents=keep_parents)
+            counters.add(counters.get_removed_deltas(rows))
+
+        return deleted
 
     def safe_delete(self):
-        self.state = self.StateChoice.DELETED
-        return self.save()
+        with atomic_for_update():
+            state = (
+                select_for_update_of_self(Sepulka.objects.filter(pk=self.pk))
+                .values_list("state", flat=True)
+                .first()
+            )
+
+            if state is None or state == self.StateChoice.DELETED:
+                return
+
+            # The counters are moved by `CountedChangesMixin.save`.
+            self.state = self.StateChoice.DELETED
+            self._saved_values["state"] = state
+            self.save(update_fields=["state", "date_updated"])
+
+        flow.record(self.pk, gettext("Sepulka deleted."))
 
 
-class Process(models.Model):
+class Process(CountedChangesMixin, DirtyFieldsMixin, models.Model):
     sepulka = models.OneToOneField(
         Sepulka, on_delete=models.CASCADE,
         verbose_name=_("sepulka"),
@@ -93,12 +431,28 @@ class Process(models.Model):
 
     date_updated = models.DateTimeField(_("date updated"), auto_now=True)
 
+    counted_fields = counters.PROCESS_FLAGS
+
     class Meta:
         verbose_name = _("sepulka process")
         verbose_name_plural = _("sepulka processes")
-
-
-class Delivery(models.Model):
+        indexes = [
+            models.Index(
+                fields=["responsible", "is_processed"],
+                name="process_resp_state_idx",
+            ),
+            models.Index(
+                fields=["is_processed", "is_vaccinated"],
+                name="process_state_idx",
+            ),
+            models.Index(
+                fields=["date_updated", "id"],
+                name="process_updated_id_idx",
+            ),
+        ]
+
+
+class Delivery(CountedChangesMixin, DirtyFieldsMixin, models.Model):
     sepulka = models.OneToOneField(
         Sepulka, on_delete=models.CASCADE,
         verbose_name=_("sepulka"),
@@ -123,9 +477,22 @@ class Delivery(models.Model):
 
     date_updated = models.DateTimeField(_("date updated"), auto_now=True)
 
+    counted_fields = ("method",)
+
     class Meta:
         verbose_name = _("sepulka delivery")
         verbose_name_plural = _("sepulka deliveries")
+        indexes = [
+            models.Index(
+                fields=["responsible", "method"],
+                name="delivery_resp_method_idx",
+            ),
+            models.Index(fields=["method"], name="delivery_method_idx"),
+            models.Index(
+                fields=["date_updated", "id"],
+                name="delivery_updated_id_idx",
+            ),
+        ]
 
 
 class Flow(models.Model):
@@ -141,3 +508,126 @@ class Flow(models.Model):
     class Meta:
         verbose_name = _("sepulka flow")
         verbose_name_plural = _("sepulka flows")
+        indexes = [
+            models.Index(
+                fields=["sepulka", "-date_created", "-id"],
+                name="flow_sepulka_date_id_idx",
+            ),
+        ]
+
+
+class SepulkaCounter(models.Model):
+    """Sharded counter of the sepulki statistics.
+
+    Counters are changed by the deltas inside the transactions changing the
+    counted rows (see `sepulka.counters`), the value of the key is the sum
+    of its shards.
+    """
+
+    key = models.CharField(_("key"), max_length=64)
+    shard = models.PositiveSmallIntegerField(_("shard"))
+    value = models.BigIntegerField(_("value"), default=0)
+
+    class Meta:
+        verbose_name = _("sepulka counter")
+        verbose_name_plural = _("sepulka counters")
+        constraints = [
+            models.UniqueConstraint(
+                fields=["key", "shard"], name="sepulka_counter_key_shard",
+            ),
+        ]
+
+
+class ArchivedSepulka(models.Model):
+    """Sepulka moved from the `Sepulka` table after the safe deletion.
+
+    Archived sepulki (and the related archived rows) are created by the
+    `archive_sepulki` command only.
+    """
+
+    code = models.UUIDField(_("code"), primary_key=True, editable=False)
+
+    name = models.CharField(_("name"), max_length=128)
+
+    is_warm = models.BooleanField(_("is warm"))
+    is_square = models.BooleanField(_("is square"))
+    is_soft = models.BooleanField(_("is soft"))
+
+    size = models.CharField(
+        _("size"), max_length=3, choices=Sepulka.SizeChoice.choices,
+    )
+    state = models.PositiveSmallIntegerField(
+        _("state"), choices=Sepulka.StateChoice.choices,
+    )
+
+    creator = models.ForeignKey(
+        get_user_model(), on_delete=models.PROTECT,
+        verbose_name=_("user creator"), related_name="+",
+    )
+
+    date_created = models.DateTimeField(_("date created"))
+    date_updated = models.DateTimeField(_("date updated"))
+    date_archived = models.DateTimeField(_("date archived"), auto_now_add=True)
+
+    class Meta:
+        verbose_name = _("archived sepulka")
+        verbose_name_plural = _("archived sepulki")
+
+
+class ArchivedProcess(models.Model):
+    sepulka = models.OneToOneField(
+        ArchivedSepulka, on_delete=models.CASCADE,
+        verbose_name=_("sepulka"), related_name="process",
+    )
+
+    responsible = models.ForeignKey(
+        get_user_model(), on_delete=models.PROTECT,
+        verbose_name=_("responsible user"), null=True, related_name="+",
+    )
+
+    is_vaccinated = models.BooleanField(_("is vaccinated"))
+    is_processed = models.BooleanField(_("is processed"))
+
+    date_updated = models.DateTimeField(_("date updated"))
+
+    class Meta:
+        verbose_name = _("archived sepulka process")
+        verbose_name_plural = _("archived sepulka processes")
+
+
+class ArchivedDelivery(models.Model):
+    sepulka = models.OneToOneField(
+        ArchivedSepulka, on_delete=models.CASCADE,
+        verbose_name=_("sepulka"), related_name="delivery",
+    )
+
+    responsible = models.ForeignKey(
+        get_user_model(), on_delete=models.PROTECT,
+        verbose_name=_("responsible user"), null=True, related_name="+",
+    )
+
+    method = models.CharField(
+        _("type"), choices=Delivery.MethodChoice.choices,
+        max_length=4, null=True,
+    )
+
+    date_updated = models.DateTimeField(_("date updated"))
+
+    class Meta:
+        verbose_name = _("archived sepulka delivery")
+        verbose_name_plural = _("archived sepulka deliveries")
+
+
+class ArchivedFlow(models.Model):
+    sepulka = models.ForeignKey(
+        ArchivedSepulka, on_delete=models.CASCADE,
+        verbose_name=_("sepulka"), related_name="flows",
+    )
+
+    message = models.CharField(_("message"), max_length=256)
+
+    date_created = models.DateTimeField(_("date created"))
+
+    class Meta:
+        verbose_name = _("archived sepulka flow")
+        verbose_name_plural = _("archived sepulka flows")
@@ -0,0 +1,24 @@
+from rest_framework.pagination import CursorPagination
+
+
+class SepulkaCursorPagination(CursorPagination):
+    """Keyset pagination over sepulki ordered by `date_created` and `code`.
+
+    Unlike `PageNumberPagination` does not count the whole table and does not
+    scan skipped rows, so any page is fetched by the same index range scan.
+    """
+
+    ordering = ("-date_created", "-code")
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 1000
+
+
+class FlowCursorPagination(SepulkaCursorPagination):
+    """Keyset pagination over flows ordered by `date_created` and `id`.
+
+    Flows are listed from the oldest one as the page number pages are, the
+    `ordering` is used by both.
+    """
+
+    ordering = ("date_created", "id")
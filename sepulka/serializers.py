@@ -1,6 +1,8 @@
+from django.utils.translation import gettext_lazy as _
 from rest_framework import serializers
 
-from account.serializers import UserSerializer
+from account.serializers import CachedUserRelatedField, UserSerializer
+from sepulka.changes import decode_watermark
 from sepulka.models import Delivery, Process, Sepulka, Flow
 
 
@@ -17,6 +19,8 @@ class ProcessRetrieveSerializer(serializers.ModelSerializer):
 
 
 class ProcessResponsibleSerializer(serializers.ModelSerializer):
+    serializer_related_field = CachedUserRelatedField
+
     class Meta:
         model = Process
         fields = "__all__"
@@ -33,6 +37,8 @@ class ProcessPropertiesSerializer(serializers.ModelSerializer):
 
 
 class DeliveryUpdateSerializer(serializers.ModelSerializer):
+    serializer_related_field = CachedUserRelatedField
+
     class Meta:
         model = Delivery
         fields = "__all__"
@@ -52,11 +58,38 @@ class DeliveryRetrieveSerializer(serializers.ModelSerializer):
 
 
 class SepulkaSerializer(serializers.ModelSerializer):
+    serializer_related_field = CachedUserRelatedField
+
     class Meta:
         model = Sepulka
         fields = "__all__"
 
 
+class SepulkaBulkListSerializer(serializers.ListSerializer):
+    """Create all validated sepulki with the batched INSERT queries.
+
+    Uses `Sepulka.objects.bulk_create_with_related` instead of the `create`
+    call of the child serializer for each item.
+    """
+
+    def create(self, validated_data):
+        return Sepulka.objects.bulk_create_with_related(
+            [Sepulka(**attrs) for attrs in validated_data],
+        )
+
+
+class SepulkaBulkCreateSerializer(SepulkaSerializer):
+    """Sepulka serializer used for the bulk creation.
+
+    Sets `creator` field as readonly, so it is not validated (and fetched)
+    for each item and must be passed to the `save` method instead.
+    """
+
+    class Meta(SepulkaSerializer.Meta):
+        read_only_fields = ("creator",)
+        list_serializer_class = SepulkaBulkListSerializer
+
+
 class SepulkaRetrieveSerializer(serializers.ModelSerializer):
     creator = serializers.StringRelatedField(read_only=True,)
 
@@ -68,6 +101,39 @@ class SepulkaRetrieveSerializer(serializers.ModelSerializer):
         )
 
 
+class SepulkaRetrieveValuesSerializer(serializers.BaseSerializer):
+    """Read-only fast path of the `SepulkaRetrieveSerializer`.
+
+    Represents rows of the queryset returned by the `get_queryset` method
+    (dicts of the `values_fields` values) without the per field dispatch
+    and without the `creator` user instances. The representation matches
+    the `SepulkaRetrieveSerializer` one field for field.
+    """
+
+    values_fields = (
+        "code", "name", "creator__username", "state",
+        "is_warm", "is_square", "is_soft", "size",
+        # Used by the cursor pagination only.
+        "date_created",
+    )
+
+    @classmethod
+    def get_queryset(cls, queryset):
+        return queryset.values(*cls.values_fields)
+
+    def to_representation(self, instance):
+        return {
+            "code": str(instance["code"]),
+            "name": instance["name"],
+            "creator": instance["creator__username"],
+            "state": instance["state"],
+            "is_warm": instance["is_warm"],
+            "is_square": instance["is_square"],
+            "is_soft": instance["is_soft"],
+            "size": instance["size"],
+        }
+
+
 class SepulkaDetailRetrieveSerializer(serializers.ModelSerializer):
     process = ProcessRetrieveSerializer(read_only=True)
     delivery = DeliveryRetrieveSerializer(read_only=True)
@@ -83,6 +149,164 @@ class SepulkaDetailRetrieveSerializer(serializers.ModelSerializer):
         )
         read_only_fields = fields
 
+    @classmethod
+    def get_queryset(cls, queryset):
+        """Fetch the related instances and the rendered fields only."""
+        return queryset.select_related(
+            "creator", "process__responsible", "delivery__responsible",
+        ).only(
+            "code", "name", "state",
+            "is_warm", "is_square", "is_soft", "size",
+            "date_created", "date_updated",
+            "creator__id", "creator__username", "creator__email",
+            "creator__is_staff", "creator__role",
+            "process__is_vaccinated", "process__is_processed",
+            "process__date_updated", "process__responsible__username",
+            "delivery__method", "delivery__date_updated",
+            "delivery__responsible__username",
+        )
+
+    version_fields = (
+        "date_updated", "process__date_updated", "delivery__date_updated",
+        "creator__username", "creator__email", "creator__is_staff",
+        "creator__role", "process__responsible__username",
+        "delivery__responsible__username",
+    )
+    """Fields changing the representation, the first ones are the dates.
+
+    The related users are not updated with the sepulka `date_updated`, so
+    their rendered fields are the part of the sepulka version.
+    """
+
+
+class SepulkaCodesSerializer(serializers.Serializer):
+    """List of the sepulka codes changed by the bulk actions."""
+
+    codes = serializers.ListField(
+        child=serializers.UUIDField(),
+        allow_empty=False, max_length=5000,
+    )
+
+
+class SepulkaClaimSerializer(serializers.Serializer):
+    """Number of the sepulki claimed by the worker at once."""
+
+    count = serializers.IntegerField(min_value=1, max_value=100, default=1)
+
+
+class SepulkaFilterSerializer(serializers.Serializer):
+    """Sepulka list filters passed by the request query params.
+
+    Multiple values of the list fields are passed by the repeated query
+    params, e.g. `?state=1&state=2`.
+    """
+
+    state = serializers.ListField(
+        child=serializers.ChoiceField(choices=Sepulka.StateChoice.choices),
+        required=False,
+    )
+    size = serializers.ListField(
+        child=serializers.ChoiceField(choices=Sepulka.SizeChoice.choices),
+        required=False,
+    )
+
+    is_warm = serializers.BooleanField(required=False, allow_null=True)
+    is_square = serializers.BooleanField(required=False, allow_null=True)
+    is_soft = serializers.BooleanField(required=False, allow_null=True)
+
+    creator = serializers.CharField(
+        required=False,
+        help_text="Creator user id or 'me' for the request user.",
+    )
+    delivery_method = serializers.ListField(
+        child=serializers.ChoiceField(choices=Delivery.MethodChoice.choices),
+        required=False,
+    )
+
+    date_created_after = serializers.DateTimeField(required=False)
+    date_created_before = serializers.DateTimeField(required=False)
+
+    name = serializers.CharField(
+        required=False, max_length=128,
+        help_text="Name prefix.",
+    )
+
+    def validate_creator(self, value):
+        if value == "me":
+            return self.context["request"].user.pk
+
+        if not value.isdigit():
+            raise serializers.ValidationError(
+                _("User id or 'me' is required."),
+            )
+
+        return int(value)
+
+
+class SepulkaEventsSerializer(serializers.Serializer):
+    """Sepulka events stream filters passed by the request query params.
+
+    Multiple codes are passed by the repeated query params, e.g.
+    `?codes=<code>&codes=<code>`.
+    """
+
+    codes = serializers.ListField(
+        child=serializers.UUIDField(), required=False, max_length=100,
+    )
+    responsible = serializers.CharField(
+        required=False,
+        help_text=(
+            "Process or delivery responsible user id or 'me' for the "
+            "request user."
+        ),
+    )
+    last_event_id = serializers.IntegerField(
+        required=False, min_value=0,
+        help_text="Resume cursor used when `Last-Event-ID` header is absent.",
+    )
+
+    def validate_responsible(self, value):
+        if value == "me":
+            return self.context["request"].user.pk
+
+        if not value.isdigit():
+            raise serializers.ValidationError(
+                _("User id or 'me' is required."),
+            )
+
+        return int(value)
+
+
+class SepulkaChangesSerializer(serializers.Serializer):
+    """Sepulki delta sync options passed by the request query params."""
+
+    since = serializers.CharField(
+        required=False,
+        help_text="Watermark returned by the previous sync.",
+    )
+    limit = serializers.IntegerField(
+        min_value=1, max_value=5000, default=500,
+        help_text="Maximum number of the returned rows of each table.",
+    )
+
+    def validate_since(self, value):
+        try:
+            return decode_watermark(value)
+        except ValueError:
+            raise serializers.ValidationError(_("Invalid watermark."))
+
+
+class SepulkaExportSerializer(serializers.Serializer):
+    """Sepulki export options passed by the request query params."""
+
+    output = serializers.ChoiceField(
+        choices=("ndjson", "csv"), default="ndjson",
+    )
+    flows = serializers.BooleanField(
+        default=False,
+        help_text="Include the sepulka flow messages.",
+    )
+
 
 class FlowSerializer(serializers.ModelSerializer):
     class Meta:
@@ -1,3 +1,1462 @@
-from django.test import TestCase
+import base64
+import csv
+import json
+import os
+import tempfile
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import StringIO
+from unittest import mock, skipUnless
+from uuid import UUID
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.db import connection, connections, transaction
+from django.db.models import F
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import serializers as drf_serializers
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from account.models import User
+from sepulka import changes, claims, counters, serializers, transitions
+from sepulka.async_views import SepulkaEventsAsyncView
+from sepulka.models import (ArchivedDelivery, ArchivedFlow, ArchivedProcess,
+                            ArchivedSepulka, Delivery, Flow, Process,
+                            Sepulka, SepulkaCounter, atomic_for_update)
+from sepulka.views import SepulkaViewSet
+
+
+skip_unless_sqlite = skipUnless(
+    connection.vendor == "sqlite", "EXPLAIN QUERY PLAN is SQLite specific.",
+)
+
+
+def explain(sql):
+    """Return the SQLite query plan details of the given SQL."""
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+        return [row[-1] for row in cursor.fetchall()]
+
+
+class SepulkaTestMixin:
+    """Create the users of every role and the authenticated API client."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.create_test_data()
+
+    @classmethod
+    def create_test_data(cls):
+        cls.shmurdik = User.objects.create_user(
+            "shmurdik", password="password", role=User.RoleChoice.SHMURDIK,
+        )
+        cls.grymzik = User.objects.create_user(
+            "grymzik", password="password", role=User.RoleChoice.GRYMZIK,
+        )
+        cls.fufelnitsa = User.objects.create_user(
+            "fufelnitsa", password="password",
+            role=User.RoleChoice.FUFELNITSA,
+        )
+
+        # Create the rows of all counter shards, so every counter delta is
+        # the single UPDATE query whatever shard is picked.
+        SepulkaCounter.objects.bulk_create(
+            SepulkaCounter(key=key, shard=shard)
+            for key in [
+                *map(counters.get_state_key, Sepulka.StateChoice),
+                *map(counters.get_size_key, Sepulka.SizeChoice),
+                *map(counters.get_method_key, Delivery.MethodChoice),
+                *counters.PROCESS_FLAGS,
+            ]
+            for shard in range(counters.SHARDS)
+        )
+
+    def setUp(self):
+        super().setUp()
+
+        if not isinstance(self, TestCase):
+            # `TransactionTestCase` flushes the data after each test.
+            self.create_test_data()
+
+        for cache in caches.all():
+            cache.clear()
+
+        self.client = self.get_client(self.shmurdik)
+
+    def get_client(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def create_sepulki(self, number, **kwargs):
+        return Sepulka.objects.bulk_create_with_related([
+            Sepulka(name=f"sepulka {index}", creator=self.shmurdik, **kwargs)
+            for index in range(number)
+        ])
+
+
+class DatabaseConnectionTests(TestCase):
+    @skip_unless_sqlite
+    def test_pragmas(self):
+        with connection.cursor() as cursor:
+            for name, value in [("journal_mode", "wal"), ("busy_timeout", 5000)]:
+                cursor.execute(f"PRAGMA {name}")
+                self.assertEqual(cursor.fetchone()[0], value)
+
+    def test_reuse(self):
+        # `CONN_MAX_AGE` keeps the connection open after the request,
+        # otherwise each request connects (and runs the connection setup)
+        # again. The connect cost is measured by the `benchmark` command.
+        for max_age, reused in [(60, True), (0, False)]:
+            wrapper = type(connections["default"])(
+                {**connection.settings_dict, "CONN_MAX_AGE": max_age},
+                alias="reuse",
+            )
+
+            try:
+                wrapper.ensure_connection()
+                database_connection = wrapper.connection
+                wrapper.close_if_unusable_or_obsolete()
+
+                with self.subTest(max_age=max_age):
+                    self.assertEqual(
+                        wrapper.connection is database_connection, reused,
+                    )
+            finally:
+                wrapper.close()
+
+
+class TransactionModeTests(TransactionTestCase):
+    def get_begin(self, atomic):
+        """Return the statement beginning the transaction of the block."""
+        with CaptureQueriesContext(connection) as queries:
+            with atomic():
+                User.objects.exists()
+
+        return queries[0]["sql"]
+
+    @skip_unless_sqlite
+    def test_begin(self):
+        # Only the read-then-write blocks take the write lock when they
+        # begin.
+        self.assertEqual(self.get_begin(transaction.atomic), "BEGIN")
+        self.assertEqual(self.get_begin(atomic_for_update), "BEGIN IMMEDIATE")
+
+        with transaction.atomic():
+            with CaptureQueriesContext(connection) as queries:
+                with atomic_for_update():
+                    User.objects.exists()
+
+            self.assertNotIn("BEGIN", queries[0]["sql"])
+
+        self.assertFalse(connection.begin_immediate)
+
+
+@override_settings(REQUEST_METRICS=True)
+class RequestMetricsTests(SepulkaTestMixin, TestCase):
+    def get_timings(self, response):
+        """Return the `Server-Timing` durations by the metric names."""
+        return {
+            name: float(params.split("dur=")[1].split(";")[0])
+            for name, _, params in (
+                metric.strip().partition(";")
+                for metric in response.headers["Server-Timing"].split(",")
+            )
+        }
+
+    def test_serializer_time(self):
+        self.create_sepulki(200)
+
+        response = self.client.get("/sepulki/")
+        timings = self.get_timings(response)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(timings["serializer"], 0)
+        self.assertLess(timings["serializer"], timings["total"])
+
+        response = self.client.post(
+            "/sepulki/bulk/", [{"name": "sepulka"}], format="json",
+        )
+        self.assertGreater(self.get_timings(response)["serializer"], 0)
+
+        self.client.force_login(self.shmurdik)
+        response = self.client.get("/async/sepulki/")
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(self.get_timings(response)["serializer"], 0)
+
+    def test_serializer_classes(self):
+        # The serializers are timed by the views, the DRF classes are intact.
+        self.client.get("/sepulki/")
+
+        for cls in (
+            drf_serializers.BaseSerializer, drf_serializers.Serializer,
+            drf_serializers.ListSerializer,
+        ):
+            with self.subTest(cls=cls.__name__):
+                self.assertEqual(
+                    cls.is_valid.__module__, "rest_framework.serializers",
+                )
+                self.assertEqual(
+                    cls.data.fget.__module__, "rest_framework.serializers",
+                )
+
+
+class SepulkaBulkCreateTests(SepulkaTestMixin, TestCase):
+    def get_items(self, number):
+        return [
+            {"name": f"sepulka {index}", "size": Sepulka.SizeChoice.XS}
+            for index in range(number)
+        ]
+
+    def test_bulk_create(self):
+        response = self.client.post(
+            "/sepulki/bulk/", self.get_items(50), format="json",
+        )
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data), 50)
+        self.assertEqual(Sepulka.objects.count(), 50)
+        self.assertEqual(Process.objects.count(), 50)
+        self.assertEqual(Delivery.objects.count(), 50)
+
+    def test_bulk_create_errors(self):
+        response = self.client.post(
+            "/sepulki/bulk/", [{"name": "sepulka"}, {"size": "XXXL"}],
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.data[1]), {"name", "size"})
+        self.assertFalse(Sepulka.objects.exists())
+
+    def test_bulk_create_queries(self):
+        # The number of queries does not depend on the number of items.
+        for number in (1, 50):
+            with self.subTest(number=number), self.assertNumQueries(7):
+                self.client.post(
+                    "/sepulki/bulk/", self.get_items(number), format="json",
+                )
+
+
+class DirtyFieldsTests(SepulkaTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.sepulka = self.create_sepulki(1)[0]
+
+    def assertSaved(self, **values):
+        self.assertEqual(
+            Sepulka.objects.filter(pk=self.sepulka.pk).values(*values).get(),
+            values,
+        )
+
+    def test_create_queries(self):
+        # The savepoint, 3 INSERTs and 2 counter UPDATEs.
+        with self.assertNumQueries(7):
+            Sepulka.objects.create(name="sepulka", creator=self.shmurdik)
+
+    def test_update_queries(self):
+        sepulka = Sepulka.objects.get(pk=self.sepulka.pk)
+        sepulka.name = "changed"
+
+        with CaptureQueriesContext(connection) as queries:
+            sepulka.save()
+
+        # The single UPDATE of the changed field and `date_updated`.
+        self.assertEqual(len(queries), 1)
+        self.assertIn('SET "name" = ', queries[0]["sql"])
+        self.assertNotIn('"size"', queries[0]["sql"])
+        self.assertSaved(name="changed")
+
+        with self.assertNumQueries(0):
+            sepulka.save()
+
+    def test_touch(self):
+        sepulka = Sepulka.objects.get(pk=self.sepulka.pk)
+        date_updated = sepulka.date_updated
+
+        # The explicit `update_fields` saves the unchanged instance.
+        with self.assertNumQueries(1):
+            sepulka.save(update_fields=["date_updated"])
+
+        self.assertGreater(
+            Sepulka.objects.get(pk=sepulka.pk).date_updated, date_updated,
+        )
+
+    def test_soft_delete_queries(self):
+        # The savepoint, the locking SELECT, the counted values SELECT, the
+        # single sepulka UPDATE and 3 counter UPDATEs.
+        with self.assertNumQueries(8):
+            self.sepulka.safe_delete()
+
+        self.assertSaved(state=Sepulka.StateChoice.DELETED)
+
+    def test_deferred_field(self):
+        sepulka = Sepulka.objects.only("code", "name").get(pk=self.sepulka.pk)
+        sepulka.name = "changed"
+
+        # Loads the deferred `size` and updates the `name`.
+        with self.assertNumQueries(2):
+            sepulka.size
+            sepulka.save()
+
+        self.assertSaved(name="changed")
+
+    def test_refresh_fields(self):
+        sepulka = Sepulka.objects.get(pk=self.sepulka.pk)
+        sepulka.name = "changed"
+
+        sepulka.refresh_from_db(fields=["state"])
+        sepulka.save()
+
+        self.assertSaved(name="changed")
+
+        Sepulka.objects.filter(pk=sepulka.pk).update(name="reloaded")
+        sepulka.refresh_from_db()
+
+        with self.assertNumQueries(0):
+            sepulka.save()
+
+
+class CountersTests(SepulkaTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.sepulki = self.create_sepulki(4)
+        Sepulka.objects.create(name="sepulka", creator=self.shmurdik)
+
+    def assertCounted(self):
+        self.assertEqual(counters.get_mismatches(
+            counters.get_values(), counters.count(),
+        ), {})
+
+    def test_save(self):
+        sepulka = Sepulka.objects.get(pk=self.sepulki[0].pk)
+        Process.objects.filter(sepulka=sepulka).update(is_processed=True)
+        counters.rebuild()
+
+        sepulka.size = Sepulka.SizeChoice.XL
+        sepulka.save()
+        self.assertCounted()
+
+        sepulka.state = Sepulka.StateChoice.IN_PROCESS
+        sepulka.size = Sepulka.SizeChoice.S
+        sepulka.save(update_fields=["state"])
+        self.assertCounted()
+
+        # The deleted and restored sepulka moves all its counters.
+        sepulka.state = Sepulka.StateChoice.DELETED
+        sepulka.save()
+        self.assertCounted()
+
+        sepulka.size = Sepulka.SizeChoice.XXL
+        sepulka.save()
+        self.assertCounted()
+
+        sepulka.state = Sepulka.StateChoice.CREATED
+        sepulka.save()
+        self.assertCounted()
+
+    def test_delete(self):
+        deleted, restored, removed = self.sepulki[:3]
+        Delivery.objects.filter(sepulka=removed).update(
+            method=Delivery.MethodChoice.ROLL,
+        )
+        counters.rebuild()
+
+        deleted.safe_delete()
+        self.assertCounted()
+
+        restored.safe_delete()
+        restored.state = Sepulka.StateChoice.CREATED
+        restored.save()
+        self.assertCounted()
+
+        Sepulka.objects.get(pk=removed.pk).delete()
+        self.assertCounted()
+
+        Sepulka.objects.get(pk=deleted.pk).delete()
+        self.assertCounted()
+
+        Sepulka.objects.all().delete()
+        self.assertCounted()
+        self.assertEqual(counters.get_values(), {})
+
+    def test_bulk(self):
+        self.assertCounted()
+        codes = [sepulka.pk for sepulka in self.sepulki]
+        self.sepulki[0].safe_delete()
+
+        for user, url, values in [
+            (self.shmurdik, "/sepulki/bulk/process/responsible/", {
+                "responsible": self.grymzik.pk,
+            }),
+            (self.grymzik, "/sepulki/bulk/process/conveyor/", {
+                "is_processed": True, "is_vaccinated": True,
+            }),
+            (self.fufelnitsa, "/sepulki/bulk/delivery/", {
+                "responsible": self.fufelnitsa.pk,
+                "method": Delivery.MethodChoice.AIR_BALLOON,
+            }),
+        ]:
+            response = self.get_client(user).put(
+                url, {"codes": codes, **values}, format="json",
+            )
+
+            self.assertEqual(response.status_code, 200, response.data)
+            self.assertCounted()
+
+        self.assertEqual(
+            Sepulka.objects.filter(
+                state=Sepulka.StateChoice.COMPLETED,
+            ).count(),
+            len(codes) - 1,
+        )
+
+    def test_stale_instance(self):
+        sepulka = self.sepulki[0]
+        first, second = [Process.objects.get(sepulka=sepulka) for _ in range(2)]
+
+        # Both instances are loaded before the first save, the change is
+        # counted once.
+        for process in [first, second]:
+            process.is_processed = True
+            process.save()
+
+        self.assertCounted()
+        self.assertEqual(counters.get_values()["is_processed"], 1)
+
+        # Rows of the deleted sepulki are not counted.
+        sepulka.safe_delete()
+        first.is_vaccinated = True
+        first.save()
+        self.assertCounted()
+
+    def test_stats(self):
+        Delivery.objects.filter(sepulka=self.sepulki[0]).update(
+            method=Delivery.MethodChoice.ROLL,
+        )
+        Process.objects.filter(sepulka=self.sepulki[0]).update(
+            is_processed=True,
+        )
+        counters.rebuild()
+        self.sepulki[1].safe_delete()
+
+        response = self.client.get("/sepulki/stats/")
+        self.assertEqual(response.status_code, 403)
+
+        admin = User.objects.create_user(
+            "admin", password="password", is_staff=True,
+        )
+        response = self.get_client(admin).get("/sepulki/stats/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["total"], 5)
+        self.assertEqual(response.data["live"], 4)
+        self.assertEqual(
+            response.data["state"][Sepulka.StateChoice.DELETED], 1,
+        )
+        self.assertEqual(response.data["size"][Sepulka.SizeChoice.M], 4)
+        self.assertEqual(
+            response.data["delivery_method"],
+            {**dict.fromkeys(Delivery.MethodChoice, 0),
+             Delivery.MethodChoice.ROLL: 1, None: 3},
+        )
+        self.assertEqual(response.data["is_processed"], 1)
+        self.assertEqual(response.data["is_processed_ratio"], 0.25)
+
+    def test_reconcile_counters(self):
+        SepulkaCounter.objects.filter(
+            key=counters.get_state_key(Sepulka.StateChoice.CREATED), shard=0,
+        ).update(value=F("value") + 3)
+
+        with self.assertRaisesMessage(CommandError, "1 counters mismatch."):
+            call_command("reconcile_counters", "--check", stdout=StringIO())
+
+        stdout = StringIO()
+        call_command("reconcile_counters", stdout=stdout)
+        self.assertIn("state:1: stored 8, computed 5", stdout.getvalue())
+        self.assertCounted()
+
+        stdout = StringIO()
+        call_command("reconcile_counters", "--check", stdout=stdout)
+        self.assertIn("Counters match.", stdout.getvalue())
+
+
+class ChangesTests(SepulkaTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.sepulki = self.create_sepulki(5)
+        # Rows changed during the last `changes_safety_lag` are not synced.
+        self.date = timezone.now() - timedelta(minutes=1)
+
+        for model in [Sepulka, Process, Delivery]:
+            model.objects.update(date_updated=self.date)
+
+    def sync(self, watermark=None, **params):
+        if watermark is not None:
+            params["since"] = watermark
+
+        response = self.client.get("/sepulki/changes/", params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def sync_all(self, watermark=None, limit=500):
+        """Return the pages synced until `has_more` is false."""
+        pages = []
+
+        while True:
+            pages.append(self.sync(watermark, limit=limit))
+            watermark = pages[-1]["watermark"]
+
+            if not pages[-1]["has_more"]:
+                return pages
+
+    def test_paging(self):
+        # All rows share the `date_updated`, the pages are split by the
+        # primary key.
+        pages = self.sync_all(limit=2)
+
+        self.assertEqual(
+            [len(page["sepulki"]) for page in pages], [2, 2, 1],
+        )
+        self.assertEqual(
+            [row["code"] for page in pages for row in page["sepulki"]],
+            sorted(sepulka.pk for sepulka in self.sepulki),
+        )
+        self.assertEqual(
+            sum(len(page["processes"]) for page in pages), len(self.sepulki),
+        )
+
+    def test_tombstones(self):
+        watermark = self.sync_all()[-1]["watermark"]
+        deleted = self.sepulki[0]
+        deleted.safe_delete()
+        Sepulka.objects.filter(pk=deleted.pk).update(
+            date_updated=self.date + timedelta(seconds=1),
+        )
+
+        data = self.sync(watermark)
+
+        self.assertEqual(data["deleted"], [deleted.pk])
+        self.assertEqual(data["sepulki"], [])
+        self.assertNotEqual(data["watermark"], watermark)
+
+    def test_empty(self):
+        watermark = self.sync_all()[-1]["watermark"]
+
+        # The sepulka changed during the safety lag is synced later.
+        self.sepulki[0].name = "changed"
+        self.sepulki[0].save()
+
+        data = self.sync(watermark)
+
+        self.assertEqual(data["watermark"], watermark)
+        self.assertFalse(data["has_more"])
+        self.assertEqual(
+            [data[table] for table in ("sepulki", "processes", "deliveries")],
+            [[], [], []],
+        )
+
+    def test_invalid_watermark(self):
+        date = self.date.isoformat()
+
+        for watermark in [
+            "not a watermark",
+            "W10=",  # []
+            changes.encode_watermark({"sepulki": (self.date, "code")}),
+            changes.encode_watermark({"processes": (self.date, "id")}),
+            changes.encode_watermark({"sepulki": (self.date.replace(
+                tzinfo=None,
+            ), self.sepulki[0].pk)}),
+            base64.urlsafe_b64encode(json.dumps({
+                "unknown": [date, 1],
+            }).encode()).decode(),
+            base64.urlsafe_b64encode(json.dumps({
+                "processes": ["2026-02-30T00:00:00+00:00", 1],
+            }).encode()).decode(),
+        ]:
+            with self.subTest(watermark=watermark):
+                response = self.client.get(
+                    "/sepulki/changes/", {"since": watermark},
+                )
+                self.assertEqual(response.status_code, 400)
+                self.assertIn("since", response.data)
+
+
+class ExportTests(SepulkaTestMixin, TestCase):
+    name = 'sepulka, "quoted"\nname'
+
+    def setUp(self):
+        super().setUp()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sepulki = self.create_sepulki(5)
+
+        Sepulka.objects.filter(pk=self.sepulki[0].pk).update(name=self.name)
+        self.codes = sorted(str(sepulka.pk) for sepulka in self.sepulki)
+
+    def export(self, client=None, **params):
+        response = (client or self.client).get("/sepulki/export/", params)
+        self.assertEqual(response.status_code, 200)
+        return response, b"".join(response.streaming_content).decode()
+
+    def test_ndjson(self):
+        # The rows query and the flows query of each of 3 chunks.
+        with mock.patch.object(
+            SepulkaViewSet, "export_chunk_size", 2,
+        ), self.assertNumQueries(4):
+            response, content = self.export(flows="true")
+
+        rows = [json.loads(line) for line in content.splitlines()]
+
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        self.assertEqual(sorted(row["code"] for row in rows), self.codes)
+        self.assertIn(self.name, [row["name"] for row in rows])
+        self.assertEqual({row["creator"] for row in rows}, {"shmurdik"})
+        self.assertEqual(
+            [[flow["message"] for flow in row["flows"]] for row in rows],
+            [["Sepulka created."]] * len(rows),
+        )
+
+        response, content = self.export()
+        rows = [json.loads(line) for line in content.splitlines()]
+
+        self.assertEqual(len(rows), len(self.codes))
+        self.assertNotIn("flows", rows[0])
+
+    def test_csv(self):
+        with mock.patch.object(SepulkaViewSet, "export_chunk_size", 2):
+            response, content = self.export(output="csv", flows="true")
+
+        rows = list(csv.DictReader(StringIO(content)))
+
+        self.assertEqual(response["Content-Type"], "text/csv")
+        self.assertEqual(sorted(row["code"] for row in rows), self.codes)
+        # The name with the delimiter, quotes and newline is quoted.
+        self.assertIn(self.name, [row["name"] for row in rows])
+        self.assertEqual(
+            json.loads(rows[0]["flows"])[0]["message"], "Sepulka created.",
+        )
+
+        response, content = self.export(output="csv")
+        self.assertNotIn("flows", next(csv.DictReader(StringIO(content))))
+
+    def test_permission(self):
+        response = self.get_client(self.grymzik).get("/sepulki/export/")
+        self.assertEqual(response.status_code, 403)
+
+
+class CommandsTests(TestCase):
+    def test_seed(self):
+        call_command(
+            "seed", "--sepulki", "30", "--users", "1", "--batch-size", "20",
+            "--seed", "1", stdout=StringIO(),
+        )
+
+        self.assertEqual(Sepulka.objects.count(), 30)
+        self.assertEqual(Process.objects.count(), 30)
+        self.assertEqual(Delivery.objects.count(), 30)
+        self.assertEqual(counters.get_mismatches(
+            counters.get_values(), counters.count(),
+        ), {})
+
+        # The related rows dates are spread with the sepulka ones.
+        self.assertGreater(
+            Flow.objects.values("date_created").distinct().count(), 30,
+        )
+        for model, field in [
+            (Flow, "date_created"), (Process, "date_updated"),
+            (Delivery, "date_updated"),
+        ]:
+            with self.subTest(model=model.__name__):
+                self.assertFalse(model.objects.filter(**{
+                    f"{field}__lt": F("sepulka__date_created"),
+                }).exists())
+                self.assertFalse(model.objects.filter(**{
+                    f"{field}__gt": F("sepulka__date_updated"),
+                }).exists())
+
+    def test_benchmark(self):
+        call_command(
+            "seed", "--sepulki", "40", "--users", "1", "--seed", "1",
+            stdout=StringIO(),
+        )
+
+        with self.assertRaises(CommandError):
+            call_command("benchmark", stdout=StringIO())
+
+        with (
+            tempfile.TemporaryDirectory() as directory,
+            # The test environment is set up by the test runner already.
+            mock.patch(
+                "sepulka.management.commands.benchmark.setup_test_environment",
+            ),
+        ):
+            output = os.path.join(directory, "benchmark.json")
+            call_command(
+                "benchmark", "--yes", "--requests", "1", "--warmup", "0",
+                "--output", output, stdout=StringIO(),
+            )
+
+            with open(output) as file:
+                results = json.load(file)
+
+        self.assertEqual(results["meta"]["sepulki"], 40)
+        self.assertIn("sepulka.retrieve", results["actions"])
+        for name, stats in results["actions"].items():
+            with self.subTest(action=name):
+                self.assertEqual(stats["requests"], 1)
+                self.assertEqual(stats["errors"], {})
+
+
+class ArchiveTests(SepulkaTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sepulki = self.create_sepulki(4)
+            old, recent = self.sepulki[:2]
+            old.safe_delete()
+            recent.safe_delete()
+
+        Sepulka.objects.filter(pk=old.pk).update(
+            date_updated=timezone.now() - timedelta(days=31),
+        )
+        self.old, self.recent = old, recent
+
+    def test_live_manager(self):
+        live = {sepulka.pk for sepulka in self.sepulki[2:]}
+
+        self.assertEqual(set(Sepulka.live.values_list("pk", flat=True)), live)
+        self.assertEqual(
+            set(Sepulka.objects.values_list("pk", flat=True)),
+            {sepulka.pk for sepulka in self.sepulki},
+        )
+        self.assertEqual(
+            {UUID(row["code"]) for row in self.client.get("/sepulki/").data},
+            live,
+        )
+
+    def test_archive(self):
+        stdout = StringIO()
+        call_command("archive_sepulki", "--dry-run", stdout=stdout)
+        self.assertIn("1 sepulki to archive.", stdout.getvalue())
+
+        flows = Flow.objects.filter(sepulka=self.old).count()
+        call_command("archive_sepulki", "--batch-size", "1", stdout=StringIO())
+
+        # The long deleted sepulka is moved with the related rows.
+        archived = ArchivedSepulka.objects.get()
+        self.assertEqual(archived.pk, self.old.pk)
+        self.assertEqual(archived.name, self.old.name)
+        self.assertTrue(ArchivedProcess.objects.filter(sepulka=archived).exists())
+        self.assertTrue(
+            ArchivedDelivery.objects.filter(sepulka=archived).exists(),
+        )
+        self.assertEqual(
+            ArchivedFlow.objects.filter(sepulka=archived).count(), flows,
+        )
+
+        self.assertFalse(Sepulka.objects.filter(pk=self.old.pk).exists())
+        for model in [Process, Delivery, Flow]:
+            self.assertFalse(model.objects.filter(sepulka=self.old).exists())
+
+        # The recently deleted sepulka is kept.
+        self.assertTrue(Sepulka.objects.filter(pk=self.recent.pk).exists())
+        self.assertEqual(counters.get_mismatches(
+            counters.get_values(), counters.count(),
+        ), {})
+
+
+class SepulkaQueriesTests(SepulkaTestMixin, TestCase):
+    """Number of the queries of the sepulka endpoints does not depend on the
+    number of the sepulki."""
+
+    def create_sepulki(self, number, **kwargs):
+        sepulki = super().create_sepulki(number, **kwargs)
+        codes = [sepulka.pk for sepulka in sepulki]
+
+        Process.objects.filter(sepulka__in=codes).update(
+            responsible=self.grymzik,
+        )
+        Delivery.objects.filter(sepulka__in=codes).update(
+            responsible=self.fufelnitsa, method=Delivery.MethodChoice.ROLL,
+        )
+        transitions.advance(codes)
+
+        return sepulki
+
+    def assertNumQueriesPerSize(self, num, request, sizes=(1, 30)):
+        """Assert the request issues `num` queries for each number of the
+        created sepulki passed to the `request` callable."""
+        for number in sizes:
+            sepulki = self.create_sepulki(number)
+
+            for cache in caches.all():
+                cache.clear()
+
+            with self.subTest(number=number), self.assertNumQueries(num):
+                response = request(sepulki)
+
+            self.assertLess(response.status_code, 300)
+
+    def test_list(self):
+        self.assertNumQueriesPerSize(
+            2, lambda sepulki: self.client.get("/sepulki/"),
+        )
+
+    def test_list_cursor(self):
+        # The cursor pages are served without the validators aggregate.
+        self.assertNumQueriesPerSize(
+            1, lambda sepulki: self.client.get("/sepulki/?pagination=cursor"),
+        )
+
+    def test_retrieve(self):
+        self.assertNumQueriesPerSize(
+            2, lambda sepulki: self.client.get(f"/sepulki/{sepulki[0].pk}/"),
+        )
+
+    def test_list_flow(self):
+        self.assertNumQueriesPerSize(
+            3, lambda sepulki: self.client.get(
+                f"/sepulki/{sepulki[0].pk}/list_flow/",
+            ),
+        )
+
+    def test_bulk_set_process_responsible(self):
+        self.assertNumQueriesPerSize(
+            9, lambda sepulki: self.client.put(
+                "/sepulki/bulk/process/responsible/",
+                {
+                    "codes": [sepulka.pk for sepulka in sepulki],
+                    "responsible": self.grymzik.pk,
+                },
+                format="json",
+            ),
+        )
+
+    def test_bulk_update_process_properties(self):
+        client = self.get_client(self.grymzik)
+
+        self.assertNumQueriesPerSize(
+            20, lambda sepulki: client.put(
+                "/sepulki/bulk/process/conveyor/",
+                {
+                    "codes": [sepulka.pk for sepulka in sepulki],
+                    "is_processed": True,
+                },
+                format="json",
+            ),
+        )
+
+    def test_bulk_update_delivery(self):
+        client = self.get_client(self.fufelnitsa)
+
+        self.assertNumQueriesPerSize(
+            10, lambda sepulki: client.put(
+                "/sepulki/bulk/delivery/",
+                {
+                    "codes": [sepulka.pk for sepulka in sepulki],
+                    "method": Delivery.MethodChoice.AIR_BALLOON,
+                },
+                format="json",
+            ),
+        )
+
+
+class ConditionalGetTests(SepulkaTestMixin, TestCase):
+    def assertNotModified(self, url, modified=False):
+        etag = self.client.get(url).headers["ETag"]
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200 if modified else 304)
+
+    def test_list(self):
+        self.create_sepulki(3)
+
+        self.assertNotModified("/sepulki/")
+
+        etag = self.client.get("/sepulki/").headers["ETag"]
+        self.create_sepulki(1)
+
+        self.assertEqual(
+            self.client.get("/sepulki/", HTTP_IF_NONE_MATCH=etag).status_code,
+            200,
+        )
+
+    def test_list_creator(self):
+        self.create_sepulki(3)
+        etag = self.client.get("/sepulki/").headers["ETag"]
+
+        self.shmurdik.username = "shmurdik-renamed"
+        self.shmurdik.save()
+
+        response = self.client.get("/sepulki/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            {row["creator"] for row in response.data}, {"shmurdik-renamed"},
+        )
+
+    def test_list_cursor(self):
+        self.create_sepulki(3)
+
+        response = self.client.get("/sepulki/?pagination=cursor")
+
+        self.assertFalse(response.has_header("ETag"))
+
+    def test_retrieve(self):
+        sepulka = self.create_sepulki(1)[0]
+        url = f"/sepulki/{sepulka.pk}/"
+        etag = self.client.get(url).headers["ETag"]
+
+        self.assertNotModified(url)
+
+        # The creator is rendered by the detail, but its update does not
+        # touch the sepulka.
+        self.shmurdik.email = "shmurdik@example.com"
+        self.shmurdik.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["creator"]["email"], self.shmurdik.email)
+
+    def test_retrieve_responsible(self):
+        sepulka = self.create_sepulki(1)[0]
+        Process.objects.filter(sepulka=sepulka).update(responsible=self.grymzik)
+        url = f"/sepulki/{sepulka.pk}/"
+        etag = self.client.get(url).headers["ETag"]
+
+        # The cached payload costs the validators query only.
+        with self.assertNumQueries(1):
+            self.client.get(url)
+
+        # The cached payload is not served for the renamed responsible.
+        self.grymzik.username = "renamed"
+        self.grymzik.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers["ETag"], etag)
+        self.assertEqual(response.data["process"]["responsible"], "renamed")
+
+
+class SepulkaListSerializerTests(SepulkaTestMixin, TestCase):
+    """The list values serializer renders as the model serializer.
+
+    The list latencies are measured by the `benchmark` command.
+    """
+
+    def test_values_serializer(self):
+        self.create_sepulki(20)
+        queryset = Sepulka.live.order_by("pk")
+        rows = list(
+            serializers.SepulkaRetrieveValuesSerializer.get_queryset(queryset),
+        )
+
+        self.assertEqual(
+            [
+                dict(row) for row in serializers.SepulkaRetrieveSerializer(
+                    queryset.select_related("creator"), many=True,
+                ).data
+            ],
+            serializers.SepulkaRetrieveValuesSerializer(rows, many=True).data,
+        )
+
+
+class CursorPaginationTests(SepulkaTestMixin, TestCase):
+    def get_pages(self, url):
+        """Return the pages following the `next` links from the given URL
+        and the SQL of the last page query."""
+        pages = []
+
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+
+            pages.append(response.data["results"])
+            url = response.data["next"]
+
+        return pages, queries[-1]["sql"]
+
+    def assertKeysetPlan(self, sql, index):
+        self.assertNotIn("OFFSET", sql)
+        self.assertNotIn("COUNT(", sql)
+
+        plan = explain(sql)
+        self.assertIn(f"USING INDEX {index} (", plan[0])
+        self.assertFalse([detail for detail in plan if "TEMP B-TREE" in detail])
+
+    def test_sepulki(self):
+        sepulki = self.create_sepulki(120)
+
+        pages, sql = self.get_pages("/sepulki/?pagination=cursor&page_size=50")
+
+        self.assertEqual([len(page) for page in pages], [50, 50, 20])
+        self.assertEqual(
+            [row["code"] for page in pages for row in page],
+            [str(sepulka.pk) for sepulka in sorted(
+                sepulki, key=lambda sepulka: (sepulka.date_created, sepulka.pk),
+                reverse=True,
+            )],
+        )
+
+    @skip_unless_sqlite
+    def test_sepulki_deep_page_plan(self):
+        self.create_sepulki(300)
+
+        pages, sql = self.get_pages("/sepulki/?pagination=cursor&page_size=50")
+
+        self.assertEqual(len(pages), 6)
+        # The deep page is fetched by the index range scan, as the first one.
+        self.assertKeysetPlan(sql, "sepulka_date_created_code_idx")
+
+    def create_flows(self, number):
+        sepulka = self.create_sepulki(1)[0]
+        Flow.objects.bulk_create(
+            Flow(sepulka=sepulka, message=str(index))
+            for index in range(number)
+        )
+        return sepulka
+
+    def test_flows(self):
+        sepulka = self.create_flows(120)
+
+        pages, sql = self.get_pages(
+            f"/sepulki/{sepulka.pk}/list_flow/?pagination=cursor",
+        )
+
+        self.assertEqual([len(page) for page in pages], [50, 50, 20])
+        self.assertEqual(
+            [row["message"] for page in pages for row in page],
+            [str(index) for index in range(120)],
+        )
+
+        # The page number pages use the same ordering.
+        response = self.client.get(f"/sepulki/{sepulka.pk}/list_flow/")
+        self.assertEqual(
+            [row["message"] for row in response.data],
+            [row["message"] for page in pages for row in page],
+        )
+
+    @skip_unless_sqlite
+    def test_flows_deep_page_plan(self):
+        sepulka = self.create_flows(300)
+
+        pages, sql = self.get_pages(
+            f"/sepulki/{sepulka.pk}/list_flow/?pagination=cursor",
+        )
+
+        self.assertEqual(len(pages), 6)
+        self.assertKeysetPlan(sql, "flow_sepulka_date_id_idx")
+
+
+class SepulkaFilterTests(SepulkaTestMixin, TestCase):
+    def get_list(self, url):
+        """Return the rows of the first cursor page and the SQL of the page
+        query."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f"{url}&pagination=cursor")
+
+        self.assertEqual(response.status_code, 200)
+        return response.data["results"], queries[-1]["sql"]
+
+    def test_name(self):
+        Sepulka.objects.bulk_create_with_related([
+            Sepulka(name=name, creator=self.shmurdik)
+            for name in ["abc", "abd", "ABC", "ab", "b", "a%c"]
+        ])
+
+        for prefix, names in [
+            ("ab", {"abc", "abd", "ab"}),
+            ("abc", {"abc"}),
+            ("a%", {"a%c"}),
+        ]:
+            with self.subTest(prefix=prefix):
+                rows, sql = self.get_list(f"/sepulki/?name={prefix}")
+                self.assertEqual({row["name"] for row in rows}, names)
+
+    def test_creator(self):
+        other = User.objects.create_user(
+            "other", role=User.RoleChoice.SHMURDIK,
+        )
+        self.create_sepulki(3)
+        Sepulka.objects.bulk_create_with_related([
+            Sepulka(name="other", creator=other),
+        ])
+
+        rows, sql = self.get_list(f"/sepulki/?creator={other.pk}")
+
+        self.assertEqual([row["name"] for row in rows], ["other"])
+
+    @skip_unless_sqlite
+    def test_plans(self):
+        self.create_sepulki(300)
+
+        for url, index in [
+            ("/sepulki/?name=sepulka%201", "sepulka_sepulka_name_290aa25d"),
+            (
+                f"/sepulki/?creator={self.shmurdik.pk}",
+                "sepulka_creator_state_idx",
+            ),
+            (
+                f"/sepulki/?creator={self.shmurdik.pk}&state=1",
+                "sepulka_creator_state_idx",
+            ),
+        ]:
+            with self.subTest(url=url):
+                rows, sql = self.get_list(url)
+                plan = explain(sql)
+
+                self.assertTrue(rows)
+                self.assertTrue([
+                    detail for detail in plan if detail.startswith(
+                        f"SEARCH sepulka_sepulka USING INDEX {index} (",
+                    )
+                ], plan)
+
+
+class AsyncViewsTests(SepulkaTestMixin, TestCase):
+    async def test_cursor_pagination(self):
+        await sync_to_async(self.create_sepulki)(5)
+        await self.async_client.aforce_login(self.shmurdik)
+
+        url = "/sepulki/?pagination=cursor&page_size=2"
+        response = await self.async_client.get(f"/async{url}")
+        expected = await sync_to_async(self.client.get)(url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json()["results"], json.loads(expected.content)["results"],
+        )
+        self.assertIn("cursor=", response.json()["next"])
+
+    async def test_list_creator(self):
+        await sync_to_async(self.create_sepulki)(3)
+        await self.async_client.aforce_login(self.shmurdik)
+        etag = (await self.async_client.get("/async/sepulki/")).headers["ETag"]
+
+        self.shmurdik.username = "shmurdik-renamed"
+        await self.shmurdik.asave()
+
+        response = await self.async_client.get(
+            "/async/sepulki/", headers={"If-None-Match": etag},
+        )
+        self.assertEqual(response.status_code, 200)
+
+    async def test_flows_cursor_pagination(self):
+        sepulka = (await sync_to_async(self.create_sepulki)(1))[0]
+        await self.async_client.aforce_login(self.shmurdik)
+
+        response = await self.async_client.get(
+            f"/async/sepulki/{sepulka.pk}/list_flow/?pagination=cursor",
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["previous"], None)
+
+    async def test_authentication(self):
+        token = await Token.objects.acreate(user=self.shmurdik)
+
+        response = await self.async_client.get("/async/sepulki/")
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.headers["WWW-Authenticate"], "Token")
+
+        response = await self.async_client.get(
+            "/async/sepulki/", headers={"Authorization": f"Token {token.key}"},
+        )
+        self.assertEqual(response.status_code, 200)
+
+        # The session authentication as the sync endpoints.
+        await self.async_client.aforce_login(self.shmurdik)
+        response = await self.async_client.get("/async/sepulki/")
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(SEPULKA_EVENTS_POLL_INTERVAL=0)
+    async def test_events_late_flow(self):
+        sepulka = (await sync_to_async(self.create_sepulki)(1))[0]
+        first, late, last = [
+            await Flow.objects.acreate(sepulka=sepulka, message=f"flow {index}")
+            for index in range(3)
+        ]
+        late_pk = late.pk
+        await late.adelete()
+
+        stream = SepulkaEventsAsyncView().stream(Flow.objects.all(), first.pk)
+        await anext(stream)  # The retry interval.
+
+        self.assertIn(f"id: {last.pk}\n", await anext(stream))
+
+        # The older id committed after the younger one is sent late.
+        await Flow.objects.acreate(pk=late_pk, sepulka=sepulka, message="late")
+        self.assertIn(f"id: {late_pk}\n", await anext(stream))
+
+        await stream.aclose()
+
+
+class ReplicaTests(SepulkaTestMixin, TransactionTestCase):
+    """Reads of the safe requests from the replica database file.
+
+    The replica is the copy of the test database, it is not updated after
+    the copy, as the lagging replica.
+    """
+
+    alias = "replica_test"
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(cls.directory.cleanup)
+
+        # The alias is added after the test runner has set up the databases,
+        # the replica file is not the test database.
+        connections.settings[cls.alias] = {
+            **connections["default"].settings_dict,
+            "NAME": os.path.join(cls.directory.name, "replica.sqlite3"),
+        }
+        cls.databases = {*cls.databases, cls.alias}
+        cls.addClassCleanup(connections.settings.pop, cls.alias)
+        cls.addClassCleanup(lambda: connections[cls.alias].close())
+
+    def setUp(self):
+        super().setUp()
+
+        settings_override = override_settings(DATABASE_REPLICAS=[self.alias])
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def copy_to_replica(self):
+        connections["default"].ensure_connection()
+        connections[self.alias].ensure_connection()
+        connections["default"].connection.backup(
+            connections[self.alias].connection,
+        )
+
+    def test_router(self):
+        sepulka = self.create_sepulki(1)[0]
+        self.copy_to_replica()
+        Sepulka.objects.filter(pk=sepulka.pk).update(name="primary")
+
+        response = self.client.get("/sepulki/")
+        self.assertEqual(response.data[0]["name"], sepulka.name)
+
+        # Reads of the unsafe requests and of the transactions use the
+        # primary.
+        with transaction.atomic():
+            self.assertEqual(
+                Sepulka.objects.get(pk=sepulka.pk).name, "primary",
+            )
+
+    def test_detail_cache(self):
+        sepulka = self.create_sepulki(1)[0]
+        self.copy_to_replica()
+        sepulka.name = "primary"
+        sepulka.save()
+
+        # The payload cached by the (lagging replica) entity tag is read from
+        # the primary.
+        for _ in range(2):
+            response = self.client.get(f"/sepulki/{sepulka.pk}/")
+            self.assertEqual(response.data["name"], "primary")
+
+
+class TransitionsTests(SepulkaTestMixin, TestCase):
+    def test_advance(self):
+        created, processed = self.create_sepulki(2)
+        Process.objects.filter(sepulka=processed).update(
+            responsible=self.grymzik, is_processed=True,
+        )
+
+        states = transitions.advance([created.pk, processed.pk])
+
+        self.assertEqual(states, {
+            processed.pk: Sepulka.StateChoice.PROCESSED,
+        })
+        self.assertEqual(
+            dict(Sepulka.objects.values_list("pk", "state")),
+            {
+                created.pk: Sepulka.StateChoice.CREATED,
+                processed.pk: Sepulka.StateChoice.PROCESSED,
+            },
+        )
+
+    def test_advance_queries(self):
+        # Each transition is the single SELECT and the single UPDATE
+        # whatever the number of the sepulki.
+        for number in (1, 50):
+            codes = [sepulka.pk for sepulka in self.create_sepulki(number)]
+            Process.objects.filter(sepulka__in=codes).update(
+                responsible=self.grymzik,
+            )
+
+            with self.subTest(number=number), self.assertNumQueries(8):
+                states = transitions.advance(codes)
+
+            self.assertEqual(len(states), number)
+
+
+class ClaimsTests(SepulkaTestMixin, TestCase):
+    def test_claim(self):
+        sepulki = self.create_sepulki(5)
+        Process.objects.filter(sepulka=sepulki[0]).update(
+            responsible=self.grymzik,
+        )
+
+        claimed = claims.claim(Process, self.grymzik, 3)
+
+        # The oldest unassigned processes are claimed and advanced.
+        self.assertEqual(claimed, [sepulka.pk for sepulka in sepulki[1:4]])
+        self.assertEqual(
+            set(Sepulka.objects.filter(
+                state=Sepulka.StateChoice.IN_PROCESS,
+            ).values_list("pk", flat=True)),
+            set(claimed),
+        )
+        self.assertEqual(claims.claim(Process, self.grymzik, 3), [sepulki[4].pk])
+        self.assertEqual(claims.claim(Process, self.grymzik, 3), [])
+
+    def test_claim_process(self):
+        sepulki = self.create_sepulki(3)
+        client = self.get_client(self.grymzik)
+
+        first = client.post("/sepulki/claim/process/", {"count": 2})
+        second = client.post("/sepulki/claim/process/", {"count": 2})
+        third = client.post("/sepulki/claim/process/", {"count": 2})
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(
+            [row["code"] for row in first.data + second.data],
+            [str(sepulka.pk) for sepulka in sepulki],
+        )
+        for row in first.data + second.data:
+            self.assertEqual(row["state"], Sepulka.StateChoice.IN_PROCESS)
+            self.assertEqual(row["process"]["responsible"], "grymzik")
+        self.assertEqual(third.status_code, 200)
+        self.assertEqual(third.data, [])
+
+        self.assertEqual(
+            Process.objects.filter(responsible=self.grymzik).count(), 3,
+        )
+
+    def test_claim_delivery(self):
+        sepulki = self.create_sepulki(2)
+        codes = [sepulka.pk for sepulka in sepulki]
+        Process.objects.update(responsible=self.grymzik, is_processed=True)
+        transitions.advance(codes)
+
+        client = self.get_client(self.fufelnitsa)
+        response = client.post("/sepulki/claim/delivery/", {"count": 5})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [row["code"] for row in response.data], [str(code) for code in codes],
+        )
+        for row in response.data:
+            self.assertEqual(row["state"], Sepulka.StateChoice.IN_DELIVERY)
+            self.assertEqual(row["delivery"]["responsible"], "fufelnitsa")
+        self.assertEqual(
+            client.post("/sepulki/claim/delivery/").data, [],
+        )
+
+    def test_claim_role(self):
+        self.create_sepulki(1)
+
+        for url, user in [
+            ("/sepulki/claim/process/", self.fufelnitsa),
+            ("/sepulki/claim/process/", self.shmurdik),
+            ("/sepulki/claim/delivery/", self.grymzik),
+        ]:
+            with self.subTest(url=url, user=user.username):
+                response = self.get_client(user).post(url)
+                self.assertEqual(response.status_code, 403)
+
+        self.assertFalse(
+            Process.objects.filter(responsible__isnull=False).exists(),
+        )
+
+
+class ClaimsConcurrencyTests(SepulkaTestMixin, TransactionTestCase):
+    workers = 6
+
+    def test_concurrent_claim(self):
+        codes = {sepulka.pk for sepulka in self.create_sepulki(40)}
+        barrier = threading.Barrier(self.workers)
+
+        def work():
+            claimed = []
+
+            try:
+                barrier.wait()
+
+                while True:
+                    codes = claims.claim(Process, self.grymzik, 3)
+
+                    if not codes:
+                        return claimed
+
+                    claimed.extend(codes)
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(self.workers) as executor:
+            futures = [executor.submit(work) for _ in range(self.workers)]
+            claimed = [code for future in futures for code in future.result()]
+
+        # Every process is claimed once.
+        self.assertEqual(len(claimed), len(codes))
+        self.assertEqual(set(claimed), codes)
+        self.assertFalse(
+            Process.objects.filter(responsible__isnull=True).exists(),
+        )
+
+
+class TransitionsConcurrencyTests(SepulkaTestMixin, TransactionTestCase):
+    workers = 8
+    rounds = 5
+
+    def test_concurrent_advance(self):
+        sepulki = self.create_sepulki(30)
+        codes = [sepulka.pk for sepulka in sepulki]
+        Process.objects.update(responsible=self.grymzik, is_processed=True)
+        Delivery.objects.update(responsible=self.fufelnitsa)
+        counters.rebuild()
+
+        barrier = threading.Barrier(self.workers)
+
+        def work():
+            try:
+                barrier.wait()
+                return [transitions.advance(codes) for _ in range(self.rounds)]
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(self.workers) as executor:
+            futures = [executor.submit(work) for _ in range(self.workers)]
+
+            for future in futures:
+                future.result()
+
+        self.assertEqual(
+            Sepulka.objects.filter(
+                state=Sepulka.StateChoice.IN_DELIVERY,
+            ).count(),
+            len(codes),
+        )
+
+        # Every transition has been made (and recorded) once.
+        flows = Counter(
+            Flow.objects.filter(message__startswith="Sepulka state")
+            .values_list("sepulka_id", "message")
+        )
+        self.assertEqual(len(flows), 3 * len(codes))
+        self.assertEqual(set(flows.values()), {1})
+
+        self.assertEqual(counters.get_mismatches(
+            counters.get_values(), counters.count(),
+        ), {})
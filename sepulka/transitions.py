@@ -0,0 +1,94 @@
+from django.db import connections, router
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.translation import gettext
+
+from sepulka import counters, flow
+from sepulka.models import (Sepulka, atomic_for_update,
+                            select_for_update_of_self)
+
+State = Sepulka.StateChoice
+
+TRANSITIONS = (
+    (State.CREATED, State.IN_PROCESS, Q(process__responsible__isnull=False)),
+    (State.IN_PROCESS, State.PROCESSED, Q(process__is_processed=True)),
+    (State.PROCESSED, State.IN_DELIVERY, Q(delivery__responsible__isnull=False)),
+    (State.IN_DELIVERY, State.COMPLETED, Q(delivery__method__isnull=False)),
+)
+"""Sepulka state transitions in the order of the sepulka lifecycle.
+
+Each transition is the `(expected state, target state, condition)` tuple,
+where the condition is checked against the sepulka process and delivery.
+"""
+
+
+def compare_and_set(codes, expected, target, condition):
+    """Change state of the given sepulki matching the condition.
+
+    The matching rows are locked (on backends supporting
+    `SELECT ... FOR UPDATE`, SQLite transactions hold the database write
+    lock, see `sepulka.models.atomic_for_update`) and changed by the single
+    `UPDATE ... WHERE pk IN (...) AND state = <expected>` statement, so the
+    sepulka changed by the concurrent writer is skipped instead of
+    overwritten.
+
+    Must be called inside the `atomic_for_update` block.
+
+    Returns:
+        List of codes of the sepulki whose state has been changed.
+    """
+    queryset = Sepulka.objects.filter(pk__in=codes, state=expected)
+    connection = connections[router.db_for_write(Sepulka)]
+
+    if connection.features.has_select_for_update:
+        queryset = select_for_update_of_self(queryset)
+
+    changed = list(queryset.filter(condition).values_list("pk", flat=True))
+
+    Sepulka.objects.filter(pk__in=changed, state=expected).update(
+        state=target, date_updated=timezone.now(),
+    )
+    return changed
+
+
+def advance(codes):
+    """Advance the given sepulki through all the allowed transitions.
+
+    Records the flow message of each transition and updates the state
+    counters.
+
+    Returns:
+        Map of the changed sepulki codes to their new states.
+    """
+    states = {}
+
+    with atomic_for_update():
+        # Skip transitions that no given sepulka can make.
+        current = set(
+            Sepulka.objects.filter(pk__in=codes)
+            .values_list("state", flat=True).distinct()
+        )
+
+        for expected, target, condition in TRANSITIONS:
+            if expected not in current:
+                continue
+
+            changed = compare_and_set(codes, expected, target, condition)
+
+            if not changed:
+                continue
+
+            current.add(target)
+
+            counters.add({
+                counters.get_state_key(expected): -len(changed),
+                counters.get_state_key(target): len(changed),
+            })
+
+            flow.record_many(changed, gettext(
+                "Sepulka state: %(expected)s -> %(target)s.",
+            ) % {"expected": expected.label, "target": target.label})
+
+            states.update(dict.fromkeys(changed, target))
+
+    return states
@@ -2,13 +2,27 @@ from django.core.exceptions import ValidationError
 from django.utils.translation import gettext_lazy as _
 
 from account.models import User
+from account.roles import get_user_flags
 
 
 def abstract_validate_user_role(user, role):
-    if user.role != role:
+    """Validate the role of the given user instance or user primary key.
+
+    The user flags are read by the `account.roles.get_user_flags`, so the
+    validation of the primary key does not query the database on the cache
+    hit.
+    """
+    flags = get_user_flags(user)
+
+    if flags is None:
+        raise ValidationError(
+            _("User %(pk)s does not exist."), params={"pk": user},
+        )
+
+    if flags.role != role:
         raise ValidationError(
             _("%(username)s is not a %(role)s"),
-            params={"username": user.username, "role": role.label,},
+            params={"username": flags.username, "role": role.label,},
         )
 
 
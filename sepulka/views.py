@@ -1,30 +1,106 @@
+from datetime import timedelta
+
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Max
+from django.http import StreamingHttpResponse
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
-from rest_framework import mixins
+from rest_framework import mixins, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError as APIValidationError
 from rest_framework.pagination import PageNumberPagination
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.viewsets import GenericViewSet
 
 from account import permissions
-from sepulka import serializers
-from sepulka.models import Sepulka
+from config.metrics import SerializerTimingMixin, serializer_timing
+from config.replicas import use_primary
+from sepulka import (cache, changes, claims, counters, export, filters,
+                     flow, pagination, serializers, transitions)
+from sepulka.conditional import conditional_get, make_etag
+from sepulka.models import (Delivery, Flow, Process, Sepulka,
+                            atomic_for_update, select_for_update_of_self)
 
 
 class SepulkaViewSet(
+    SerializerTimingMixin,
     mixins.ListModelMixin,
     mixins.CreateModelMixin,
     mixins.RetrieveModelMixin,
     mixins.DestroyModelMixin,
     GenericViewSet,
 ):
-    queryset = Sepulka.objects.all()
+    queryset = Sepulka.live.all()
     serializer_class = serializers.SepulkaSerializer
     pagination_class = PageNumberPagination
+    filter_backends = (filters.SepulkaFilterBackend,)
+
+    cursor_pagination_class = pagination.SepulkaCursorPagination
+    """Pagination class used if the client requested the cursor pagination."""
+    pagination_query_param = "pagination"
+
+    bulk_create_max_length = 5000
+    """Max number of sepulki created by the single `bulk_create` request."""
+    export_chunk_size = 2000
+    """Number of sepulki fetched by the single `export` query."""
+
+    changes_safety_lag = timedelta(seconds=5)
+    """Age of the changes returned by the delta sync.
+
+    Rows are updated with the `date_updated` set before the transaction
+    commit, so the youngest changes can be committed out of order.
+    """
+
+    @property
+    def paginator(self):
+        """The paginator instance associated with the view, or `None`.
+
+        Uses `cursor_pagination_class` instead of the `pagination_class` if
+        the `pagination_query_param` query param equals to 'cursor'.
+        """
+        if not hasattr(self, "_paginator"):
+            pagination_class = self.pagination_class
+
+            if self.request.query_params.get(
+                self.pagination_query_param,
+            ) == "cursor":
+                pagination_class = self.cursor_pagination_class
+
+            self._paginator = pagination_class() if pagination_class else None
+
+        return self._paginator
+
+    def get_queryset(self):
+        # Shape the queryset depends on the request action, so the related
+        # instances required by the action serializer are fetched by the
+        # same query.
+        queryset = super().get_queryset()
+
+        if self.action == "list":
+            return serializers.SepulkaRetrieveValuesSerializer.get_queryset(
+                queryset,
+            )
+
+        if self.action == "retrieve":
+            return serializers.SepulkaDetailRetrieveSerializer.get_queryset(
+                queryset,
+            )
+
+        if self.action in ["set_process_responsible", "update_process_properties"]:
+            return queryset.select_related("process__responsible")
+
+        if self.action == "update_delivery":
+            return queryset.select_related("delivery__responsible")
+
+        if self.action == "list_flow":
+            return queryset.only("code")
+
+        return queryset
 
     def get_serializer_class(self):
         if self.action == "list":
-            return serializers.SepulkaRetrieveSerializer
+            return serializers.SepulkaRetrieveValuesSerializer
 
         if self.action == "retrieve":
             return serializers.SepulkaDetailRetrieveSerializer
@@ -42,6 +118,114 @@ class SepulkaViewSet(
 
         return perms
 
+    def get_detail_lookup(self):
+        """Return the requested sepulka primary key."""
+        return self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+
+    def get_list_validators(self, request, *args, **kwargs):
+        """Return the list page validators.
+
+        Aggregates the number of filtered sepulki and their max
+        `date_updated`, so any created, updated or deleted sepulka changes
+        the page entity tag. The rows render the creator usernames, so the
+        max `date_updated` of the creators is aggregated too. The page number
+        pagination counts the filtered sepulki anyway, the cursor pages are
+        served without validators, so the keyset query stays the only one.
+        """
+        if isinstance(self.paginator, pagination.SepulkaCursorPagination):
+            return None, None
+
+        aggregate = self.filter_queryset(Sepulka.live.all()).aggregate(
+            count=Count("pk"), last_modified=Max("date_updated"),
+            creators_modified=Max("creator__date_updated"),
+        )
+
+        etag = make_etag(
+            request.get_full_path(), request.user.pk,
+            aggregate["count"], aggregate["last_modified"],
+            aggregate["creators_modified"],
+        )
+        last_modified = max((
+            date for date in [
+                aggregate["last_modified"], aggregate["creators_modified"],
+            ] if date
+        ), default=None)
+        return etag, last_modified
+
+    def get_retrieve_validators(self, request, *args, **kwargs):
+        """Return the sepulka validators.
+
+        Uses the max `date_updated` of the sepulka and its process and
+        delivery, and the rendered fields of the related users (see
+        `SepulkaDetailRetrieveSerializer.version_fields`) fetched by the
+        single query.
+        """
+        try:
+            values = Sepulka.live.filter(pk=self.get_detail_lookup()).values_list(
+                *serializers.SepulkaDetailRetrieveSerializer.version_fields,
+            ).first()
+        except ValidationError:
+            values = None
+
+        if not values:
+            return None, None
+
+        last_modified = max(date for date in values[:3] if date)
+        return make_etag(self.get_detail_lookup(), *values), last_modified
+
+    def get_list_flow_validators(self, request, *args, **kwargs):
+        """Return the sepulka flows page validators.
+
+        Flows are append-only, so the max `id` and the number of flows
+        identify the flows state.
+        """
+        try:
+            aggregate = Flow.objects.filter(
+                sepulka_id=self.get_detail_lookup(),
+            ).exclude(
+                sepulka__state=Sepulka.StateChoice.DELETED,
+            ).aggregate(
+                count=Count("id"), last_id=Max("id"),
+                last_modified=Max("date_created"),
+            )
+        except ValidationError:
+            return None, None
+
+        if not aggregate["count"]:
+            return None, None
+
+        etag = make_etag(
+            request.get_full_path(),
+            aggregate["count"], aggregate["last_id"],
+        )
+        return etag, aggregate["last_modified"]
+
+    @conditional_get("get_list_validators")
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @conditional_get("get_retrieve_validators")
+    def retrieve(self, request, *args, **kwargs):
+        # Use the payload cached by the current sepulka entity tag if exists.
+        etag, _ = self.validators
+
+        if etag is None:
+            return super().retrieve(request, *args, **kwargs)
+
+        code = self.get_detail_lookup()
+        payload = cache.get_detail(code, etag)
+
+        if payload is not None:
+            return Response(payload)
+
+        # The replica can lag behind the validators, read the cached payload
+        # from the primary database.
+        with use_primary():
+            response = super().retrieve(request, *args, **kwargs)
+
+        cache.set_detail(code, etag, response.data)
+        return response
+
     def perform_destroy(self, instance):
         return instance.safe_delete()
 
@@ -51,6 +235,133 @@ class SepulkaViewSet(
 
         return super().create(request, *args, **kwargs)
 
+    @action(
+        methods=["POST"], detail=False,
+        url_path=r"bulk", url_name="bulk",
+        serializer_class=serializers.SepulkaBulkCreateSerializer,
+        permission_classes=(
+            IsAuthenticated, permissions.IsShmurdikPermission,
+        ),
+    )
+    def bulk_create(self, request, *args, **kwargs):
+        """Create many sepulki by the single request.
+
+        Validates the given list of sepulki and creates all of them (with the
+        related `Process` and `Delivery` rows) inside the single transaction.
+
+        Returns:
+            Response (201) with the created sepulki if all the given items are
+            valid, response (400) with the list of errors per item otherwise.
+        """
+
+        serializer = self.get_serializer(
+            data=request.data, many=True,
+            max_length=self.bulk_create_max_length,
+        )
+        serializer.is_valid(raise_exception=True)
+
+        serializer.save(creator=request.user)
+
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    @action(
+        methods=["GET"], detail=False,
+        permission_classes=(
+            IsAuthenticated, permissions.IsShmurdikOrStaffPermission,
+        ),
+    )
+    def export(self, request, *args, **kwargs):
+        """Stream all filtered sepulki with the process and delivery fields.
+
+        Supports the list filters, `output` ('ndjson' or 'csv') and `flows`
+        query params. Rows are fetched and sent by chunks, so the memory
+        usage does not depend on the number of exported sepulki.
+        """
+
+        options = serializers.SepulkaExportSerializer(data=request.query_params)
+        options.is_valid(raise_exception=True)
+
+        output = options.validated_data["output"]
+        with_flows = options.validated_data["flows"]
+
+        rows = export.iter_rows(
+            self.filter_queryset(self.get_queryset()),
+            chunk_size=self.export_chunk_size, with_flows=with_flows,
+        )
+
+        if output == "csv":
+            response = StreamingHttpResponse(
+                export.iter_csv(rows, with_flows=with_flows),
+                content_type="text/csv",
+            )
+            response.headers["Content-Disposition"] = (
+                'attachment; filename="sepulki.csv"'
+            )
+            return response
+
+        return StreamingHttpResponse(
+            export.iter_ndjson(rows), content_type="application/x-ndjson",
+        )
+
+    @action(methods=["GET"], detail=False)
+    def changes(self, request, *args, **kwargs):
+        """Return the sepulki changed since the given watermark.
+
+        Returns the `sepulki`, `processes` and `deliveries` rows changed
+        after the `since` watermark (all rows if it is not given), codes of
+        the safely deleted sepulki (`deleted`), the new `watermark` and the
+        `has_more` flag. Clients repeat the request with the new watermark
+        until `has_more` is false.
+
+        Supports the list filters of the sepulka fields which can not be
+        changed (the `state` and `delivery_method` filters are not
+        supported). Changes of the last `changes_safety_lag` are returned by
+        the next sync. Tombstones of the archived sepulki are lost, so the
+        clients offline longer than the archive retention sync from scratch.
+        """
+        unsupported = {"state", "delivery_method"} & request.query_params.keys()
+
+        if unsupported:
+            raise APIValidationError({
+                field: [_("The filter is not supported.")]
+                for field in unsupported
+            })
+
+        options = serializers.SepulkaChangesSerializer(
+            data=request.query_params,
+        )
+        options.is_valid(raise_exception=True)
+
+        return Response(changes.get_changes(
+            filters.SepulkaFilterBackend().get_filters(request, self),
+            cursors=options.validated_data.get("since", {}),
+            until=timezone.now() - self.changes_safety_lag,
+            limit=options.validated_data["limit"],
+        ))
+
+    @action(
+        methods=["GET"], detail=False,
+        url_path=r"cache-stats", url_name="cache-stats",
+        permission_classes=(IsAdminUser,),
+    )
+    def cache_stats(self, request, *args, **kwargs):
+        """Return the sepulka detail cache counters of the process."""
+        return Response(cache.get_stats())
+
+    @action(
+        methods=["GET"], detail=False,
+        url_path=r"stats", url_name="stats",
+        permission_classes=(IsAdminUser,),
+    )
+    def stats(self, request, *args, **kwargs):
+        """Return the sepulki counts by the state, size and delivery method
+        and the processed and vaccinated ratios of the live sepulki.
+
+        Reads the incrementally maintained counters (see `sepulka.counters`)
+        instead of counting the rows.
+        """
+        return Response(counters.get_stats())
+
     def update_related_model(self, request, instance, *args, **kwargs):
         if request.method == "OPTIONS":
             return self.options(request, *args, **kwargs)
@@ -61,7 +372,13 @@ class SepulkaViewSet(
             )
             serializer.is_valid(raise_exception=True)
 
+            old_values = {
+                field: getattr(instance, field)
+                for field in serializer.validated_data
+            }
             serializer.save()
+            flow.record_changes(instance, old_values)
+            transitions.advance([instance.sepulka_id])
 
             if getattr(instance, '_prefetched_objects_cache', None):
                 # If 'prefetch_related' has been applied to a queryset, we need to
@@ -118,10 +435,169 @@ class SepulkaViewSet(
             *args, **kwargs,
         )
 
+    def bulk_update_related_model(self, request, model, *args, **kwargs):
+        """Apply the same change to the related model of many sepulki.
+
+        Validates the payload (and the responsible user role) once, then
+        updates rows of all the given live sepulki by the single UPDATE
+        query.
+
+        Returns:
+            Response (200) with the map of the given codes to the 'updated'
+            or 'not_found' result.
+        """
+        if request.method == "OPTIONS":
+            return self.options(request, *args, **kwargs)
+
+        codes_serializer = serializers.SepulkaCodesSerializer(data=request.data)
+        codes_serializer.is_valid(raise_exception=True)
+        codes = codes_serializer.validated_data["codes"]
+
+        serializer = self.get_serializer(data=request.data, partial=True)
+        serializer.is_valid(raise_exception=True)
+        values = serializer.validated_data
+
+        if not values:
+            raise APIValidationError(
+                {"non_field_errors": [_("No fields to update.")]},
+            )
+
+        relations = [
+            name for name in values
+            if model._meta.get_field(name).is_relation
+        ]
+
+        with atomic_for_update():
+            instances = list(select_for_update_of_self(
+                model.objects.select_related(*relations)
+                .filter(sepulka_id__in=codes)
+                .exclude(sepulka__state=Sepulka.StateChoice.DELETED),
+            ))
+
+            model.objects.filter(
+                pk__in=[instance.pk for instance in instances],
+            ).update(**values, date_updated=timezone.now())
+
+            changed_values = []
+
+            for instance in instances:
+                old_values = {
+                    field: getattr(instance, field) for field in values
+                }
+
+                for field, value in values.items():
+                    setattr(instance, field, value)
+
+                flow.record_changes(instance, old_values)
+                changed_values.append((old_values, values))
+
+            counters.add(counters.get_change_deltas(model, changed_values))
+
+            updated = {instance.sepulka_id for instance in instances}
+            transitions.advance(updated)
+
+        return Response({
+            str(code): "updated" if code in updated else "not_found"
+            for code in codes
+        })
+
+    def claim_related_model(self, request, model, *args, **kwargs):
+        """Assign the next unassigned sepulki related model to the user.
+
+        Picks and assigns up to `count` rows by the single transaction (see
+        `sepulka.claims.claim`), so the concurrent workers never claim the
+        same sepulka.
+
+        Returns:
+            Response (200) with the list of the claimed sepulki details
+            (empty if there is nothing to claim).
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        codes = claims.claim(
+            model, request.user, serializer.validated_data["count"],
+        )
+
+        queryset = serializers.SepulkaDetailRetrieveSerializer.get_queryset(
+            Sepulka.objects.filter(pk__in=codes),
+        ).order_by("date_created")
+
+        with serializer_timing():
+            data = serializers.SepulkaDetailRetrieveSerializer(
+                queryset, many=True,
+            ).data
+
+        return Response(data)
+
+    @action(
+        methods=["POST"], detail=False,
+        url_path=r"claim/process", url_name="claim-process",
+        serializer_class=serializers.SepulkaClaimSerializer,
+        permission_classes=(
+            IsAuthenticated, permissions.IsGrymzikPermission,
+        ),
+    )
+    def claim_process(self, request, *args, **kwargs):
+        return self.claim_related_model(request, Process, *args, **kwargs)
+
+    @action(
+        methods=["POST"], detail=False,
+        url_path=r"claim/delivery", url_name="claim-delivery",
+        serializer_class=serializers.SepulkaClaimSerializer,
+        permission_classes=(
+            IsAuthenticated, permissions.IsFufelnitsaPermission,
+        ),
+    )
+    def claim_delivery(self, request, *args, **kwargs):
+        return self.claim_related_model(request, Delivery, *args, **kwargs)
+
+    @action(
+        methods=["PUT", "OPTIONS"], detail=False,
+        url_path=r"bulk/process/responsible",
+        url_name="bulk-process-responsible",
+        serializer_class=serializers.ProcessResponsibleSerializer,
+        permission_classes=(
+            IsAuthenticated, permissions.IsShmurdikPermission,
+        ),
+    )
+    def bulk_set_process_responsible(self, request, *args, **kwargs):
+        return self.bulk_update_related_model(
+            request, Process, *args, **kwargs,
+        )
+
+    @action(
+        methods=["PUT", "OPTIONS"], detail=False,
+        url_path=r"bulk/process/conveyor", url_name="bulk-process-conveyor",
+        serializer_class=serializers.ProcessPropertiesSerializer,
+        permission_classes=(
+            IsAuthenticated, permissions.IsGrymzikPermission,
+        ),
+    )
+    def bulk_update_process_properties(self, request, *args, **kwargs):
+        return self.bulk_update_related_model(
+            request, Process, *args, **kwargs,
+        )
+
+    @action(
+        methods=["PUT", "OPTIONS"], detail=False,
+        url_path=r"bulk/delivery", url_name="bulk-delivery",
+        serializer_class=serializers.DeliveryUpdateSerializer,
+        permission_classes=(
+            IsAuthenticated, permissions.IsFufelnitsaPermission,
+        ),
+    )
+    def bulk_update_delivery(self, request, *args, **kwargs):
+        return self.bulk_update_related_model(
+            request, Delivery, *args, **kwargs,
+        )
+
     @action(
         methods=["GET", "OPTIONS"], detail=True,
         serializer_class=serializers.FlowSerializer,
+        cursor_pagination_class=pagination.FlowCursorPagination,
     )
+    @conditional_get("get_list_flow_validators")
     def list_flow(self, request, pk=None, format=None):
         instance = self.get_object()
 
@@ -129,7 +605,9 @@ class SepulkaViewSet(
             return self.options(request, pk=pk, format=format)
 
         if request.method == "GET":
-            messages = instance.flow_set.all()
+            messages = instance.flow_set.order_by(
+                *pagination.FlowCursorPagination.ordering,
+            )
 
             page = self.paginate_queryset(messages)
             if page is not None: